@@ -0,0 +1,141 @@
+"""
+Benchmark of the dashboard data path on synthetic CSV files: cold load, filtering,
+every aggregation and every figure build with its serialized size, as JSON lists and as binary typed arrays,
+with and without gzip.
+
+    python benchmarks/bench_dashboard.py --sizes 10k 1m 10m
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_filter_index import SCENARIOS, best_of
+from health.callbacks import normalize_filter_state, render_figure, summarize
+from health.data import DataProvider
+from health.encoding import to_json
+from health.figures import FIGURE_BUILDERS
+from health.sources import FrameSource
+from health.storage import columns_path, write_columns
+from health.timing import STARTUP_TIMINGS
+from synthetic import SIZES, ensure_csv
+
+TABLE_SORT = [{'column_id': 'Billing Amount', 'direction': 'desc'}]
+TABLE_PAGE_SIZE = 10
+
+def cold_load(csv_path):
+    """
+    Loads the CSV into a new provider, returns (source, seconds, startup phase timings).
+    """
+    STARTUP_TIMINGS.clear()
+    provider = DataProvider(csv_path)
+    start = time.perf_counter()
+    provider.get()
+    return FrameSource(provider), time.perf_counter() - start, dict(STARTUP_TIMINGS)
+
+def uncached(source, function):
+    # every run starts without the filtered frame and cells cached by the source
+    def run(*args):
+        source.clear_caches()
+        return function(*args)
+    return run
+
+def stages(source):
+    """
+    (name, function of the filter state) of every step between a filter change and its outputs.
+    """
+    return [
+        ('filter rows', uncached(source, source.rows)),
+        ('cube cells', uncached(source, source.cells)),
+        ('summary', uncached(source, lambda state: summarize(state, source))),
+        ('stay histogram', uncached(source, source.stay_histogram)),
+        ('time series', uncached(source, source.time_series)),
+        ('table page', uncached(source, lambda state: source.table_page(state, 0, TABLE_PAGE_SIZE, TABLE_SORT, ''))),
+    ]
+
+def payload_sizes(repeat, value, encoding):
+    """
+    (encode seconds, bytes, gzip compressed bytes) of `value` serialized in the payload `encoding`.
+    """
+    encode_time, payload = best_of(repeat, to_json, value, encoding)
+    payload = payload.encode('utf-8')
+    return encode_time, len(payload), len(gzip.compress(payload))
+
+def print_table(title, header, rows):
+    print(f"\n{title}")
+    print(f"{'':<30}" + ''.join(f'{column:>14}' for column in header))
+    for label, values in rows:
+        print(f"{label:<30}" + ''.join(f'{value:>14}' for value in values))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k', '1m'])
+    parser.add_argument('--data-dir', default=os.path.join('data', 'synthetic'),
+                        help='where the synthetic CSV files are kept, missing ones are generated')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--columnar', action='store_true',
+                        help='also measure the cold load from the memory-mapped columnar copy')
+    args = parser.parse_args()
+
+    states = [(label[:12], normalize_filter_state(*filters)) for label, *filters in SCENARIOS]
+
+    for size in args.sizes:
+        csv_path = ensure_csv(args.data_dir, size)
+        columns_dir = columns_path(csv_path)
+        shutil.rmtree(columns_dir, ignore_errors=True)
+
+        source, seconds, phases = cold_load(csv_path)
+        print(f"\n=== {SIZES[size]:,} rows ({os.path.getsize(csv_path) / 2 ** 20:.0f} MiB CSV) ===")
+        print(f"cold load from CSV {seconds:.2f}s: "
+              + ', '.join(f'{name} {value:.2f}s' for name, value in phases.items()))
+        if args.columnar:
+            write_columns(source.load().data, columns_dir, source_path=csv_path)
+            _, seconds, phases = cold_load(csv_path)
+            print(f"cold load from columns {seconds:.2f}s: "
+                  + ', '.join(f'{name} {value:.2f}s' for name, value in phases.items()))
+            shutil.rmtree(columns_dir, ignore_errors=True)
+
+        print_table('stage ms (best of repeats)', [label for label, _ in states], [
+            (name, [f'{best_of(args.repeat, function, state)[0] * 1000:.1f}' for _, state in states])
+            for name, function in stages(source)
+        ])
+
+        figure_rows = []
+        for graph_id in FIGURE_BUILDERS:
+            build_times, payloads = [], []
+            for _, state in states:
+                # cells and frames stay cached here, this measures the figure itself
+                build_time, figure = best_of(args.repeat, render_figure, graph_id, state, None, source)
+                build_times.append(build_time)
+                updates = [[list(path), value] for path, value in figure.updates]
+                payloads.append([
+                    *payload_sizes(args.repeat, figure.figure, 'json'),
+                    *payload_sizes(args.repeat, figure.figure, 'binary'),
+                    len(to_json(updates, 'binary'))
+                ])
+            slowest = np.max(payloads, axis=0)
+            figure_rows.append((graph_id, [f'{max(build_times) * 1000:.1f}'] + [
+                f'{slowest[0] * 1000:.1f}', f'{slowest[1] / 1024:.1f}', f'{slowest[2] / 1024:.1f}',
+                f'{slowest[3] * 1000:.1f}', f'{slowest[4] / 1024:.1f}', f'{slowest[5] / 1024:.1f}',
+                f'{slowest[6] / 1024:.1f}'
+            ]))
+        print_table('figures, slowest scenario, sizes in KiB', [
+            'build ms', 'json ms', 'json', 'json gzip', 'binary ms', 'binary', 'binary gzip', 'patch'
+        ], figure_rows)
+
+        table_rows = []
+        for label, state in states:
+            records, _ = source.table_page(state, 0, TABLE_PAGE_SIZE, TABLE_SORT, '')
+            encode_time, size, compressed = payload_sizes(args.repeat, records, 'json')
+            table_rows.append((label, [f'{encode_time * 1000:.2f}', f'{size / 1024:.1f}', f'{compressed / 1024:.1f}']))
+        print_table(f'table page of {TABLE_PAGE_SIZE} rows', ['json ms', 'KiB', 'gzip KiB'], table_rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of `FilterIndex.select` against the boolean mask filter it replaced.
+
+    python benchmarks/bench_filter_index.py --rows 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from health.index import FilterIndex
+from synthetic import CONDITIONS, GENDERS, generate_admissions
+
+FILTER_COLUMNS = ['Medical Condition', 'Gender', 'Age', 'Date of Admission']
+
+# (label, conditions, age range, genders, start date, end date)
+SCENARIOS = [
+    ('defaults', CONDITIONS, [18, 85], GENDERS, '2019-05-08', '2024-05-08'),
+    ('two conditions', ['Cancer', 'Diabetes'], [18, 85], GENDERS, '2019-05-08', '2024-05-08'),
+    ('age 30-50, female', CONDITIONS, [30, 50], ['Female'], '2019-05-08', '2024-05-08'),
+    ('one year', CONDITIONS, [18, 85], GENDERS, '2022-01-01', '2022-12-31'),
+    ('everything narrow', ['Asthma'], [40, 45], ['Male'], '2023-03-01', '2023-03-31'),
+]
+
+def mask_filter(data, selected_conditions, selected_age, selected_genders, start_date, end_date):
+    return data[
+        (data['Medical Condition'].isin(selected_conditions)) &
+        (data['Age'] >= selected_age[0]) & (data['Age'] <= selected_age[1]) &
+        (data['Gender'].isin(selected_genders)) &
+        (data['Date of Admission'] >= start_date) &
+        (data['Date of Admission'] <= end_date)
+    ]
+
+def index_filter(data, index, *filters):
+    return data.iloc[index.select(*filters)]
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        data = generate_admissions(rows, columns=FILTER_COLUMNS)
+        start = time.perf_counter()
+        index = FilterIndex(data)
+        print(f"\n{rows:,} rows, index built in {time.perf_counter() - start:.2f}s")
+        print(f"{'scenario':<20}{'matches':>12}{'mask ms':>12}{'index ms':>12}{'mask rows ms':>14}{'index rows ms':>15}")
+
+        for label, *filters in SCENARIOS:
+            mask_rows_time, expected = best_of(args.repeat, mask_filter, data, *filters)
+            index_rows_time, actual = best_of(args.repeat, index_filter, data, index, *filters)
+            assert np.array_equal(expected.index.to_numpy(), actual.index.to_numpy())
+
+            # selection only, without materializing the filtered frame
+            conditions, age, genders, start_date, end_date = filters
+            mask_time, _ = best_of(args.repeat, lambda: (
+                data['Medical Condition'].isin(conditions).to_numpy() &
+                (data['Age'] >= age[0]).to_numpy() & (data['Age'] <= age[1]).to_numpy() &
+                data['Gender'].isin(genders).to_numpy() &
+                (data['Date of Admission'] >= start_date).to_numpy() &
+                (data['Date of Admission'] <= end_date).to_numpy()
+            ))
+            index_time, _ = best_of(args.repeat, index.select, *filters)
+
+            print(f"{label:<20}{len(actual):>12,}{mask_time * 1000:>12.1f}{index_time * 1000:>12.1f}"
+                  f"{mask_rows_time * 1000:>14.1f}{index_rows_time * 1000:>15.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Concurrent load driver for the Dash callback endpoint `/_dash-update-component`.
+Serves `app.server` on a local port (or targets a running dashboard with `--url`), posts summary,
+figure and table updates for random filter states from many threads and reports the
+p50, p95 and p99 latency, the throughput and the response size on the wire of every callback.
+
+    python benchmarks/load_test.py --csv data/synthetic/admissions_1m.csv --threads 16 --requests 2000
+
+`--tenant` loads the dashboard of one tenant of a running multi-tenant server (see `health.tenants`).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import CONDITIONS, GENDERS, ADMISSION_DAYS, FIRST_ADMISSION
+
+def random_states(count, seed=0):
+    """
+    `count` normalized filter states over the synthetic data bounds.
+    """
+    from health.callbacks import normalize_filter_state
+
+    rng = np.random.default_rng(seed)
+    states = []
+    for _ in range(count):
+        conditions = list(rng.choice(CONDITIONS, rng.integers(1, len(CONDITIONS) + 1), replace=False))
+        genders = list(rng.choice(GENDERS, rng.integers(1, len(GENDERS) + 1), replace=False))
+        low = int(rng.integers(18, 70))
+        start = FIRST_ADMISSION + np.timedelta64(int(rng.integers(0, ADMISSION_DAYS - 30)), 'D')
+        end = start + np.timedelta64(int(rng.integers(30, ADMISSION_DAYS)), 'D')
+        states.append(normalize_filter_state(conditions, [low, int(rng.integers(low, 86))], genders, start, end))
+    return states
+
+def update_request(outputs, inputs, state=()):
+    """
+    Body of a `_dash-update-component` POST, `outputs` and `inputs` as (id, property[, value]) tuples.
+    """
+    return {
+        'output': '..' + '...'.join(f'{id_}.{prop}' for id_, prop in outputs) + '..',
+        'outputs': [{'id': id_, 'property': prop} for id_, prop in outputs],
+        'inputs': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in inputs],
+        'state': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in state],
+        'changedPropIds': [f'{inputs[0][0]}.{inputs[0][1]}'],
+    }
+
+def callback_requests(filter_state, rng):
+    """
+    (callback name, request body) of every output a filter change updates.
+    """
+    from health.layout import FIGURE_VIEWS, TAB_FIGURES
+
+    requests = [('summary', update_request(
+        [('total-patients', 'children'), ('average-age', 'children'), ('total-billing', 'children'),
+         ('average-stay', 'children'), ('summary-rendered', 'data')],
+        [('filter-state', 'data', filter_state), ('tabs', 'value', 'overview')],
+        [('summary-rendered', 'data', None)]
+    ))]
+    for tab, graph_ids in TAB_FIGURES.items():
+        for graph_id in graph_ids:
+            inputs = [('filter-state', 'data', filter_state), ('tabs', 'value', tab)]
+            if graph_id in FIGURE_VIEWS:
+                inputs.append((FIGURE_VIEWS[graph_id], 'data', {'resolution': 'auto', 'width': 1200}))
+            requests.append((graph_id, update_request(
+                [(graph_id, 'figure'), (f'{graph_id}-rendered', 'data')],
+                inputs,
+                [(f'{graph_id}-rendered', 'data', None)]
+            )))
+    requests.append(('data-table', update_request(
+        [('data-table', 'data'), ('data-table', 'page_count')],
+        [('filter-state', 'data', filter_state), ('data-table', 'page_current', int(rng.integers(0, 20))),
+         ('data-table', 'page_size', 10),
+         ('data-table', 'sort_by', [{'column_id': 'Billing Amount', 'direction': 'desc'}]),
+         ('data-table', 'filter_query', '')]
+    )))
+    return requests
+
+def serve_locally():
+    """
+    Starts the dashboard on a free local port in a background thread, returns its URL.
+    """
+    from werkzeug.serving import make_server
+
+    from health.app import app
+    from health.callbacks import register_callbacks
+    from health.sources import source
+
+    # one access log line per request would drown the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    register_callbacks(app)
+    source.load()
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, name='dashboard-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+def post(url, body, compressed=False, tenant=None):
+    """
+    Posts `body` to the callback endpoint, returns (status, bytes received on the wire).
+    """
+    headers = {'Content-Type': 'application/json'}
+    if compressed:
+        headers['Accept-Encoding'] = 'gzip'
+    if tenant:
+        headers['X-Health-Tenant'] = tenant
+    request = urllib.request.Request(
+        url + '/_dash-update-component',
+        data=json.dumps(body).encode('utf-8'),
+        headers=headers
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, len(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, 0
+
+def run_load(url, requests, threads, compressed=False, tenant=None):
+    """
+    Posts all `requests` from `threads` threads, returns ({name: [(status, seconds, bytes)]}, elapsed seconds).
+    """
+    results = defaultdict(list)
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            name, body = item
+            start = time.perf_counter()
+            status, size = post(url, body, compressed, tenant)
+            seconds = time.perf_counter() - start
+            with lock:
+                results[name].append((status, seconds, size))
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, time.perf_counter() - start
+
+def report(results, elapsed):
+    print(f"{'callback':<30}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'KiB':>8}")
+    everything = []
+    for name in sorted(results):
+        samples = results[name]
+        latencies = np.array([seconds for _, seconds, _ in samples]) * 1000
+        errors = sum(status >= 400 for status, _, _ in samples)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        size = np.mean([size for _, _, size in samples]) / 1024
+        print(f"{name:<30}{len(samples):>10}{errors:>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{size:>8.1f}")
+        everything.extend(latencies)
+    p50, p95, p99 = np.percentile(everything, [50, 95, 99])
+    print(f"{'all':<30}{len(everything):>10}{'':>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    print(f"\n{len(everything)} requests in {elapsed:.1f}s, {len(everything) / elapsed:.1f} requests/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--csv', default=None, help='CSV served by the local dashboard (HEALTH_CSV_PATH)')
+    parser.add_argument('--url', default=None, help='running dashboard to load instead of a local one')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--states', type=int, default=100,
+                        help='distinct filter states, fewer states mean more result cache hits')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gzip', action='store_true',
+                        help='accept gzip responses, the KiB column then shows the compressed size')
+    parser.add_argument('--tenant', default=None, help='tenant of the running multi-tenant dashboard at --url')
+    args = parser.parse_args()
+    if args.tenant and not args.url:
+        parser.error('--tenant needs --url')
+
+    if args.csv:
+        # read by health.data on import
+        os.environ['HEALTH_CSV_PATH'] = os.path.abspath(args.csv)
+    url = args.url or serve_locally()
+
+    rng = np.random.default_rng(args.seed)
+    states = random_states(args.states, args.seed)
+    requests = []
+    while len(requests) < args.requests:
+        requests.extend(callback_requests(states[int(rng.integers(0, len(states)))], rng))
+    requests = requests[:args.requests]
+
+    print(f"{len(requests)} requests to {url} from {args.threads} threads, {len(states)} filter states\n")
+    report(*run_load(url, requests, args.threads, args.gzip, args.tenant))
+
+if __name__ == '__main__':
+    main()
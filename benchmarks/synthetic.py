@@ -0,0 +1,123 @@
+"""
+Synthetic admissions data with the same schema as `data/hospital_data.csv`, for benchmarks.
+Run it to write CSV files the dashboard can load (`HEALTH_CSV_PATH`):
+
+    python benchmarks/synthetic.py --sizes 10k 1m 10m --output-dir data/synthetic
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CONDITIONS = ['Arthritis', 'Asthma', 'Cancer', 'Diabetes', 'Hypertension', 'Obesity']
+GENDERS = ['Female', 'Male']
+BLOOD_TYPES = ['A+', 'A-', 'AB+', 'AB-', 'B+', 'B-', 'O+', 'O-']
+ADMISSION_TYPES = ['Elective', 'Emergency', 'Urgent']
+MEDICATIONS = ['Aspirin', 'Ibuprofen', 'Lipitor', 'Paracetamol', 'Penicillin']
+INSURANCE_PROVIDERS = ['Aetna', 'Blue Cross', 'Cigna', 'Medicare', 'UnitedHealthcare']
+TEST_RESULTS = ['Abnormal', 'Inconclusive', 'Normal']
+
+FIRST_ADMISSION = pd.Timestamp('2019-05-08')
+ADMISSION_DAYS = 1827
+
+# Row counts of the generated CSV files, by the name used in their file names
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+# Rows generated at once when writing a CSV
+CHUNK_ROWS = 1_000_000
+
+def generate_admissions(rows, seed=0, columns=None):
+    """
+    Returns a DataFrame of `rows` random admissions, already preprocessed like `load_data` output.
+    `columns` restricts the generated columns (the expensive string ones can be skipped).
+    """
+    rng = np.random.default_rng(seed)
+    wanted = set(columns) if columns is not None else None
+
+    def want(name):
+        return wanted is None or name in wanted
+
+    admission = FIRST_ADMISSION + pd.to_timedelta(rng.integers(0, ADMISSION_DAYS, rows), unit='D')
+    stay = rng.integers(1, 31, rows)
+
+    generated = {}
+    if want('Name'):
+        generated['Name'] = pd.Series(rng.integers(0, rows // 2 + 1, rows)).map('Patient {}'.format)
+    if want('Age'):
+        generated['Age'] = rng.integers(18, 86, rows)
+    if want('Gender'):
+        generated['Gender'] = rng.choice(np.array(GENDERS, dtype=object), rows)
+    if want('Blood Type'):
+        generated['Blood Type'] = rng.choice(np.array(BLOOD_TYPES, dtype=object), rows)
+    if want('Medical Condition'):
+        generated['Medical Condition'] = rng.choice(np.array(CONDITIONS, dtype=object), rows)
+    if want('Date of Admission'):
+        generated['Date of Admission'] = admission
+    if want('Doctor'):
+        generated['Doctor'] = pd.Series(rng.integers(0, rows // 3 + 1, rows)).map('Doctor {}'.format)
+    if want('Hospital'):
+        generated['Hospital'] = pd.Series(rng.integers(0, rows // 3 + 1, rows)).map('Hospital {}'.format)
+    if want('Insurance Provider'):
+        generated['Insurance Provider'] = rng.choice(np.array(INSURANCE_PROVIDERS, dtype=object), rows)
+    if want('Billing Amount'):
+        generated['Billing Amount'] = rng.uniform(-2000, 52000, rows)
+    if want('Room Number'):
+        generated['Room Number'] = rng.integers(101, 501, rows)
+    if want('Admission Type'):
+        generated['Admission Type'] = rng.choice(np.array(ADMISSION_TYPES, dtype=object), rows)
+    if want('Discharge Date'):
+        generated['Discharge Date'] = admission + pd.to_timedelta(stay, unit='D')
+    if want('Medication'):
+        generated['Medication'] = rng.choice(np.array(MEDICATIONS, dtype=object), rows)
+    if want('Test Results'):
+        generated['Test Results'] = rng.choice(np.array(TEST_RESULTS, dtype=object), rows)
+    if want('Length of Stay'):
+        generated['Length of Stay'] = stay
+
+    return pd.DataFrame(generated)
+
+def csv_path(output_dir, size):
+    """
+    Path of the synthetic CSV of `size` (a key of `SIZES`) in `output_dir`.
+    """
+    return os.path.join(output_dir, f'admissions_{size}.csv')
+
+def write_csv(rows, path, seed=0):
+    """
+    Writes `rows` random admissions to `path` as a raw CSV like `data/hospital_data.csv`,
+    generated in chunks so 10M rows don't need to fit in memory at once.
+    """
+    for number, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        chunk = generate_admissions(min(CHUNK_ROWS, rows - start), seed=seed + number)
+        chunk = chunk.drop(columns='Length of Stay')
+        for column in ('Date of Admission', 'Discharge Date'):
+            chunk[column] = chunk[column].dt.strftime('%Y-%m-%d')
+        chunk.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+
+def ensure_csv(output_dir, size):
+    """
+    Path of the synthetic CSV of `size`, written first when missing.
+    """
+    path = csv_path(output_dir, size)
+    if not os.path.exists(path):
+        os.makedirs(output_dir, exist_ok=True)
+        write_csv(SIZES[size], path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic admissions CSV files.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k', '1m'])
+    parser.add_argument('--output-dir', default=os.path.join('data', 'synthetic'))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for size in args.sizes:
+        path = csv_path(args.output_dir, size)
+        start = time.perf_counter()
+        write_csv(SIZES[size], path)
+        print(f"Wrote {SIZES[size]:,} rows to {path} in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(path) / 2 ** 20:.0f} MiB)")
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,35 @@
 """
 Server setup, this happens after `register_callbacks()` is called and server can safely use this app to link callbacks to.
+The layout is served by a function, so the server answers with a loading shell until the data source is loaded.
+Timings and payload sizes are served on `/metrics`, see `metrics`.
+Responses are gzip compressed for clients accepting it, `HEALTH_COMPRESS=0` turns that off.
+With `HEALTH_TENANTS_DIR` one server serves the dashboard of every hospital in it, see `tenants`.
 """
+import os
+
 from dash import Dash
-from .layout import create_layout
-from .data import data 
+from .layout import build_layout, create_loading_layout, create_tenant_index
+from .metrics import register_metrics
+from .tenants import current_source, current_tenant, registry, start_loading
 
-app = Dash(__name__)
+# callbacks reference components that only exist once the dataset is loaded
+app = Dash(
+    __name__, suppress_callback_exceptions=True, compress=os.environ.get('HEALTH_COMPRESS', '1') != '0'
+)
 server = app.server
+register_metrics(server, app.callback_map)
+
+def serve_layout():
+    """
+    Dashboard layout when the dataset is loaded, the loading shell before that.
+    Serving several tenants, a page naming none lists them, a tenant's dataset starts loading with its page.
+    """
+    if registry is not None and current_tenant() is None:
+        return create_tenant_index(registry.names())
+    data_source = current_source()
+    if not data_source.ready:
+        start_loading()
+        return create_loading_layout()
+    return build_layout(data_source.bounds())
 
-# Build the layout using the data DataFrame
-app.layout = create_layout(data)
+app.layout = serve_layout
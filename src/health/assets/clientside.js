@@ -0,0 +1,247 @@
+/*
+ * Clientside callbacks of the dashboard, served by Dash from the assets folder.
+ * `filterState` normalizes the filters in the browser, the others implement the client-side filtering mode
+ * (see `health.client`): summary cards and count charts are computed from the 'client-cube' store.
+ */
+(function() {
+    function day(value) {
+        return value ? String(value).slice(0, 10) : null;
+    }
+
+    function copy(value) {
+        return JSON.parse(JSON.stringify(value));
+    }
+
+    function indices(values, selected) {
+        var positions = {};
+        values.forEach(function(value, index) { positions[value] = index; });
+        return (selected || []).filter(function(value) { return value in positions; })
+            .map(function(value) { return positions[value]; });
+    }
+
+    function sameList(first, second) {
+        return JSON.stringify(first) === JSON.stringify(second);
+    }
+
+    function present(labels, counts) {
+        return labels.filter(function(label, index) { return counts[index] > 0; });
+    }
+
+    function formatBilling(amount) {
+        return '$' + amount.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+    }
+
+    /*
+     * Summary values and figures of the filter state, in the order of the outputs,
+     * null when the cube can't answer the state or a chart would change its trace structure.
+     */
+    function compute(state, cube) {
+        if (!state || !cube || !cube.figures || state.version !== cube.version) {
+            return null;
+        }
+        if ((state.start_date !== null && state.start_date > cube.start_date) ||
+                (state.end_date !== null && state.end_date < cube.end_date)) {
+            return null;
+        }
+        var conditions = indices(cube.conditions, state.conditions);
+        var genders = indices(cube.genders, state.genders);
+        var low = Math.max(state.age[0] - cube.min_age, 0);
+        var high = Math.min(state.age[1] - cube.min_age, cube.ages - 1);
+
+        // sums of the selected cells per condition, `width` values per cell
+        function totals(array, width) {
+            var result = cube.conditions.map(function() { return new Array(width).fill(0); });
+            conditions.forEach(function(c) {
+                genders.forEach(function(g) {
+                    for (var a = low; a <= high; a++) {
+                        var offset = ((c * cube.genders.length + g) * cube.ages + a) * width;
+                        for (var k = 0; k < width; k++) {
+                            result[c][k] += array[offset + k];
+                        }
+                    }
+                });
+            });
+            return result;
+        }
+
+        function overall(perCondition, width) {
+            var result = new Array(width).fill(0);
+            perCondition.forEach(function(values) {
+                for (var k = 0; k < width; k++) {
+                    result[k] += values[k];
+                }
+            });
+            return result;
+        }
+
+        var summary = overall(totals(cube.summary, 4), 4);
+        var patients = summary[0];
+        if (patients <= 0) {
+            return null;
+        }
+        var admissionTypes = cube.admission_types.length;
+        var admission = overall(totals(cube.admission, admissionTypes * 2), admissionTypes * 2);
+        var admissionCounts = cube.admission_types.map(function(_, i) { return admission[i * 2]; });
+        var medicationByCondition = totals(cube.medication, cube.medications.length);
+        var medicationCounts = overall(medicationByCondition, cube.medications.length);
+        var conditionCounts = medicationByCondition.map(function(values) {
+            return values.reduce(function(sum, value) { return sum + value; }, 0);
+        });
+        var bloodWidth = cube.blood_types.length * admissionTypes;
+        var blood = overall(totals(cube.blood, bloodWidth), bloodWidth);
+
+        var builders = {
+            'admission-pie-chart': function(figure) {
+                figure.data[0].labels = present(cube.admission_types, admissionCounts);
+                figure.data[0].values = admissionCounts.filter(function(count) { return count > 0; });
+                return figure;
+            },
+            'admission-bar-chart': function(figure) {
+                var names = figure.data.map(function(trace) { return trace.name; });
+                if (!sameList(names, present(cube.admission_types, admissionCounts))) {
+                    return null;
+                }
+                figure.data.forEach(function(trace) {
+                    trace.y = [admission[cube.admission_types.indexOf(trace.name) * 2 + 1]];
+                });
+                return figure;
+            },
+            'medication-bar-chart': function(figure) {
+                // bars sorted by count, colors stay with the position like plotly express assigns them
+                var order = present(cube.medications, medicationCounts).sort(function(first, second) {
+                    return medicationCounts[cube.medications.indexOf(second)] -
+                        medicationCounts[cube.medications.indexOf(first)];
+                });
+                var traces = {};
+                figure.data.forEach(function(trace) { traces[trace.name] = trace; });
+                if (order.length !== figure.data.length || !order.every(function(name) { return name in traces; })) {
+                    return null;
+                }
+                figure.data = order.map(function(name, index) {
+                    var trace = copy(traces[name]);
+                    trace.marker.color = figure.data[index].marker.color;
+                    trace.y = [medicationCounts[cube.medications.indexOf(name)]];
+                    return trace;
+                });
+                if (figure.layout.xaxis && figure.layout.xaxis.categoryarray) {
+                    figure.layout.xaxis.categoryarray = order;
+                }
+                return figure;
+            },
+            'diagnosis-pie-chart': function(figure) {
+                figure.data[0].labels = present(cube.conditions, conditionCounts);
+                figure.data[0].values = conditionCounts.filter(function(count) { return count > 0; });
+                return figure;
+            },
+            'blood-type-treemap': function(figure) {
+                var counts = cube.blood_types.map(function(_, b) {
+                    return blood.slice(b * admissionTypes, (b + 1) * admissionTypes)
+                        .reduce(function(sum, value) { return sum + value; }, 0);
+                });
+                var labels = figure.data[0].labels;
+                if (!sameList(labels.slice().sort(), present(cube.blood_types, counts))) {
+                    return null;
+                }
+                figure.data[0].values = labels.map(function(label) { return counts[cube.blood_types.indexOf(label)]; });
+                return figure;
+            },
+            'blood-type-bar-chart': function(figure) {
+                // one trace per admission type in order of appearance, bars of the blood types having admissions
+                var traces = [], byName = {};
+                cube.blood_types.forEach(function(bloodType, b) {
+                    cube.admission_types.forEach(function(admissionType, t) {
+                        var count = blood[b * admissionTypes + t];
+                        if (count <= 0) {
+                            return;
+                        }
+                        if (!(admissionType in byName)) {
+                            byName[admissionType] = {name: admissionType, x: [], y: []};
+                            traces.push(byName[admissionType]);
+                        }
+                        byName[admissionType].x.push(bloodType);
+                        byName[admissionType].y.push(count);
+                    });
+                });
+                var structure = figure.data.map(function(trace) { return [trace.name, trace.x]; });
+                if (!sameList(structure, traces.map(function(trace) { return [trace.name, trace.x]; }))) {
+                    return null;
+                }
+                figure.data.forEach(function(trace, index) { trace.y = traces[index].y; });
+                return figure;
+            },
+            'diagnosis-medication-heatmap': function(figure) {
+                var rows = conditions.filter(function(c) { return conditionCounts[c] > 0; }).sort(function(a, b) { return a - b; });
+                var columns = cube.medications.map(function(_, m) { return m; })
+                    .filter(function(m) { return medicationCounts[m] > 0; });
+                figure.data[0].x = columns.map(function(m) { return cube.medications[m]; });
+                figure.data[0].y = rows.map(function(c) { return cube.conditions[c]; });
+                figure.data[0].z = rows.map(function(c) {
+                    return columns.map(function(m) { return medicationByCondition[c][m]; });
+                });
+                return figure;
+            }
+        };
+
+        var outputs = [
+            patients,
+            // one decimal like the server's `summarize`, 45.0 stays 45.0
+            (summary[1] / patients).toFixed(1),
+            formatBilling(summary[2]),
+            (summary[3] / patients).toFixed(1),
+            null
+        ];
+        for (var i = 0; i < cube.figure_ids.length; i++) {
+            var graphId = cube.figure_ids[i];
+            var figure = builders[graphId](copy(cube.figures[graphId]));
+            if (figure === null) {
+                return null;
+            }
+            // the rendered store is cleared, so the server sends a whole figure when it takes over again
+            outputs.push(figure, null);
+        }
+        return outputs;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        health: {
+            /*
+             * Browser twin of `callbacks.normalize_filter_state`, no request is made to normalize the filters.
+             */
+            filterState: function(conditions, age, genders, startDate, endDate, version) {
+                return {
+                    conditions: (conditions || []).slice().sort(),
+                    age: [Math.trunc(age[0]), Math.trunc(age[1])],
+                    genders: (genders || []).slice().sort(),
+                    start_date: day(startDate),
+                    end_date: day(endDate),
+                    version: version ? version.version : 0
+                };
+            },
+
+            /*
+             * Sends the filter state to the browser ('client-filter-state') when the cube answers it,
+             * to the server ('server-filter-state') otherwise. The server store is cleared once when the browser
+             * takes over, so a later server state always differs from the last one it rendered.
+             */
+            routeFilterState: function(state, cube, serverState) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!state || !cube) {
+                    // the cube is still on its way
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                if (compute(state, cube) === null) {
+                    return [state, noUpdate];
+                }
+                return [serverState == null ? noUpdate : null, state];
+            },
+
+            drawFilterState: function(state, cube) {
+                var outputs = compute(state, cube);
+                if (outputs === null) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                return outputs;
+            }
+        }
+    });
+})();
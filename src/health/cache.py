@@ -0,0 +1,205 @@
+"""
+Bounded result cache in front of the callback computation.
+Entries are keyed by the normalized filter state, see `callbacks.filter_state_key`.
+
+Configured with environment variables:
+`HEALTH_CACHE_BACKEND` (`memory` per process or `disk` shared by all gunicorn workers),
+`HEALTH_CACHE_SIZE` (max entries), `HEALTH_CACHE_TTL` (seconds, 0 disables expiry)
+and `HEALTH_CACHE_DIR` for the disk backend (`/dev/shm` backed when available).
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_SIZE = 256
+DEFAULT_TTL = 600
+
+class MemoryBackend:
+    """
+    Per-process LRU store with expiry, safe to use from several threads.
+    """
+
+    def __init__(self, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns (found, value).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            stored_at, value = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def default_cache_dir():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'health-dashboard-cache')
+
+class DiskBackend:
+    """
+    Store of pickled entries in a directory shared by every worker process.
+    File modification time records the last use, so the least recently used files are evicted.
+    Writes go through a temporary file and `os.replace`, readers never see partial entries.
+    """
+
+    def __init__(self, directory=None, maxsize=DEFAULT_SIZE, ttl=DEFAULT_TTL):
+        if directory is None:
+            directory = default_cache_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.pkl')
+
+    def _files(self):
+        return [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith('.pkl')
+        ]
+
+    def get(self, key):
+        """
+        Returns (found, value).
+        """
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                self.evictions += 1
+                return False, None
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # missing, or removed by another worker in the meantime
+            return False, None
+        if stored_key != key:
+            return False, None
+        return True, value
+
+    def set(self, key, value):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        files = self._files()
+        if len(files) <= self.maxsize:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in self._files():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._files())
+
+class ResultCache:
+    """
+    Cache of computed callback results with hit and miss counters.
+    Counters are kept per process.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value of `key`, calling `compute()` and storing its result on a miss.
+        Values have to be picklable for the disk backend.
+        """
+        found, value = self.backend.get(key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            return value
+
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        """
+        Counters of this process, plus the number of entries in the backend.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'entries': len(self.backend),
+        }
+
+    def clear(self):
+        self.backend.clear()
+
+def create_cache(namespace=None):
+    """
+    Builds the `ResultCache` configured by the `HEALTH_CACHE_*` environment variables.
+    A `namespace` (a tenant name) gets a cache of its own, in a subdirectory for the disk backend.
+    """
+    maxsize = int(os.environ.get('HEALTH_CACHE_SIZE', DEFAULT_SIZE))
+    ttl = float(os.environ.get('HEALTH_CACHE_TTL', DEFAULT_TTL))
+    backend = os.environ.get('HEALTH_CACHE_BACKEND', 'memory')
+
+    if backend == 'disk':
+        directory = os.environ.get('HEALTH_CACHE_DIR')
+        if namespace is not None:
+            directory = os.path.join(directory or default_cache_dir(), namespace)
+        return ResultCache(DiskBackend(directory, maxsize=maxsize, ttl=ttl))
+    if backend == 'memory':
+        return ResultCache(MemoryBackend(maxsize=maxsize, ttl=ttl))
+    raise ValueError(f"Unknown HEALTH_CACHE_BACKEND '{backend}', use 'memory' or 'disk'")
+
+result_cache = create_cache()
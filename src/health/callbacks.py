@@ -1,198 +1,347 @@
 """
 Mostly functional code here for `data` interactivity.
 """
+import json
+
 import pandas as pd
-import plotly.express as px
-from dash import Input, Output
+from dash import ClientsideFunction, Input, Output, Patch, State, no_update
 
 # Relative imports from the same package
-from .data import data, monthly_data
-from .theme import apply_chart_theme
+from .client import CLIENT_FIGURES, CLIENT_FILTERING, client_cube
+from .encoding import loads
+from .layout import (
+    FIGURE_VIEWS, TAB_FIGURES, age_marks, build_layout, condition_options, data_version, gender_options
+)
+from .metrics import stage
+from .render import renderer
+from .sources import filter_state_key
+from .tenants import current_source, start_loading, tenant_name
+
+def normalize_date(value):
+    """
+    Date picker values come as 'YYYY-MM-DD' or full ISO timestamps, both become 'YYYY-MM-DD'.
+    """
+    if value is None:
+        return None
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def normalize_filter_state(selected_conditions, selected_age, selected_genders, start_date, end_date, version=0):
+    """
+    Canonical, JSON serializable form of the filter inputs.
+    Equal selections made in a different order give an equal state.
+    The data `version` is part of the state, so new data changes every key and re-renders every output.
+    The browser computes the same state, see `filterState` in assets/clientside.js.
+    """
+    return {
+        'conditions': sorted(selected_conditions or []),
+        'age': [int(selected_age[0]), int(selected_age[1])],
+        'genders': sorted(selected_genders or []),
+        'start_date': normalize_date(start_date),
+        'end_date': normalize_date(end_date),
+        'version': version
+    }
+
+def aggregate_cells(filter_state, data_source=None):
+    """
+    Returns cube cells for the normalized filter state from the data source
+    (the one of the current request, see `tenants.current_source`, unless `data_source` is given).
+    Do not modify the result.
+    """
+    return (data_source or current_source()).cells(filter_state)
+
+def summarize(filter_state, data_source=None):
+    """
+    Summary card values for the normalized filter state.
+    Averages are formatted with one decimal, like `drawFilterState` in assets/clientside.js does.
+    """
+    with stage('summary'):
+        cells = aggregate_cells(filter_state, data_source)
+        total_patients = int(cells['Count'].sum())
+        average_age = cells['Age Sum'].sum() / total_patients if total_patients > 0 else 0
+        total_billing = f"${cells['Billing Amount Sum'].sum():,.2f}"
+        average_stay = cells['Length of Stay Sum'].sum() / total_patients if total_patients > 0 else 0
+    return total_patients, f'{average_age:.1f}', total_billing, f'{average_stay:.1f}'
+
+def render_figure(graph_id, filter_state, view=None, data_source=None):
+    """
+    Builds the figure of `graph_id` for the normalized filter state as a `figures.FigureUpdate`,
+    `view` is the content of its view store (see `layout.FIGURE_VIEWS`).
+    """
+    data_source = data_source or current_source()
+    # imported on first use, plotly.express is slow to import and not needed to serve the layout
+    from .figures import FIGURE_BUILDERS, build_figure
+
+    figure_source = FIGURE_BUILDERS[graph_id][0]
+    with stage('figure data', figure=graph_id):
+        if figure_source == 'series':
+            figure_data = data_source.time_series(filter_state, view)
+        elif figure_source == 'histogram':
+            figure_data = (data_source.stay_histogram(filter_state),)
+        else:
+            figure_data = (aggregate_cells(filter_state, data_source),)
+    with stage('figure build', figure=graph_id):
+        return build_figure(graph_id, *figure_data)
 
 def register_callbacks(app):
     """
     Defines and registers all Dash callbacks with the provided `app`.
+    The filters are normalized into the 'filter-state' store once, every output reads that store.
     """
 
     @app.callback(
         [
-            Output('total-patients', 'children'),
-            Output('average-age', 'children'),
-            Output('total-billing', 'children'),
-            Output('average-stay', 'children'),
-            Output('billing-graph', 'figure'),
-            Output('admission-pie-chart', 'figure'),
-            Output('admission-bar-chart', 'figure'),
-            Output('stay-line-chart', 'figure'),
-            Output('medication-bar-chart', 'figure'),
-            Output('diagnosis-pie-chart', 'figure'),
-            Output('blood-type-treemap', 'figure'),
-            Output('blood-type-bar-chart', 'figure'),
-            Output('diagnosis-medication-heatmap', 'figure'),
-            Output('data-table', 'data')
+            Output('page-content', 'children'),
+            Output('loading-interval', 'disabled')
         ],
+        [Input('loading-interval', 'n_intervals')]
+    )
+    def show_dashboard(n_intervals):
+        """
+        Swaps the loading shell for the dashboard once the dataset is loaded.
+        """
+        data_source = current_source()
+        if not data_source.ready:
+            # a tenant's dataset may have been unloaded since the shell was served
+            start_loading()
+            return no_update, no_update
+        return build_layout(data_source.bounds()), True
+
+    # normalized in the browser, a filter change only sends requests for the outputs it invalidates
+    app.clientside_callback(
+        ClientsideFunction('health', 'filterState'),
+        Output('filter-state', 'data'),
         [
             Input('condition-dropdown', 'value'),
             Input('age-slider', 'value'),
             Input('gender-checklist', 'value'),
             Input('date-picker', 'start_date'),
-            Input('date-picker', 'end_date')
+            Input('date-picker', 'end_date'),
+            Input('data-version', 'data')
         ]
     )
-    def update_dashboard(selected_conditions, selected_age, selected_genders, start_date, end_date):
-        # 1. Filter the data
-        filtered_data = data[
-            (data['Medical Condition'].isin(selected_conditions)) &
-            (data['Age'] >= selected_age[0]) & (data['Age'] <= selected_age[1]) &
-            (data['Gender'].isin(selected_genders)) &
-            (data['Date of Admission'] >= start_date) &
-            (data['Date of Admission'] <= end_date)
-        ]
 
-        # 2. Summary Cards
-        total_patients = len(filtered_data)
-        average_age = round(filtered_data['Age'].mean(), 1) if total_patients > 0 else 0
-        total_billing = f"${filtered_data['Billing Amount'].sum():,.2f}"
-        average_stay = round(filtered_data['Length of Stay'].mean(), 1) if total_patients > 0 else 0
-
-        # 3. Billing Line Chart
-        filtered_monthly_data = monthly_data[
-            (monthly_data['Medical Condition'].isin(selected_conditions)) &
-            (monthly_data['Date of Admission'] >= start_date) &
-            (monthly_data['Date of Admission'] <= end_date)
+    @app.callback(
+        [
+            Output('data-version', 'data'),
+            Output('condition-dropdown', 'options'),
+            Output('gender-checklist', 'options'),
+            Output('age-slider', 'min'),
+            Output('age-slider', 'max'),
+            Output('age-slider', 'marks'),
+            Output('date-picker', 'end_date')
+        ],
+        [Input('refresh-interval', 'n_intervals')],
+        [
+            State('data-version', 'data'),
+            State('date-picker', 'end_date')
         ]
-        billing_fig = px.line(
-            filtered_monthly_data,
-            x='Date of Admission',
-            y='Count',
-            color='Medical Condition',
-            title='Billing Amount Over Time (Monthly Aggregation)',
-            labels={'Count': 'Number of Admissions', 'Date of Admission': 'Admission Date'}
-        )
-        billing_fig = apply_chart_theme(billing_fig)
-
-        # 4. Admission Type Pie Chart
-        pie_fig = px.pie(
-            filtered_data,
-            names='Admission Type',
-            title='Admission Types Distribution',
-            hole=0.4
-        )
-        pie_fig.update_traces(textposition='outside', textinfo='percent+label')
-        pie_fig = apply_chart_theme(pie_fig)
-
-        # 5. Admission Type Bar Chart
-        bar_data = filtered_data.groupby('Admission Type')['Billing Amount'].sum().reset_index()
-        bar_fig = px.bar(
-            bar_data,
-            x='Admission Type',
-            y='Billing Amount',
-            color='Admission Type',
-            title='Total Billing Amount by Admission Type',
-            labels={
-                'Billing Amount': 'Total Billing Amount ($)',
-                'Admission Type': 'Admission Type'
-            }
-        )
-        bar_fig.update_layout(showlegend=False)
-        bar_fig = apply_chart_theme(bar_fig)
-
-        # 6. Medication Bar Chart
-        med_counts = filtered_data['Medication'].value_counts().reset_index()
-        med_counts.columns = ['Medication', 'Count']
-        med_fig = px.bar(
-            med_counts,
-            x='Medication',
-            y='Count',
-            title='Medication Counts',
-            labels={'Medication': 'Medication', 'Count': 'Number of Prescriptions'},
-            color='Medication',
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-        med_fig = apply_chart_theme(med_fig)
-
-        # 7. Diagnosis Pie Chart
-        diag_fig = px.pie(
-            filtered_data,
-            names='Medical Condition',
-            title='Diagnosis Distribution',
-            hole=0.4
-        )
-        diag_fig.update_traces(textposition='outside', textinfo='percent+label')
-        diag_fig = apply_chart_theme(diag_fig)
-
-        # 8. Blood Type Treemap
-        blood_treemap_data = filtered_data.groupby('Blood Type').size().reset_index(name='Count')
-        blood_treemap_fig = px.treemap(
-            blood_treemap_data,
-            path=['Blood Type'],
-            values='Count',
-            title='Blood Type Distribution',
-            color='Blood Type',
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-        blood_treemap_fig = apply_chart_theme(blood_treemap_fig)
-
-        # 9. Blood Type Stacked Bar Chart
-        blood_type_grouped = filtered_data.groupby(['Blood Type', 'Admission Type']).size().reset_index(name='Count')
-        blood_bar_chart_fig = px.bar(
-            blood_type_grouped,
-            x='Blood Type',
-            y='Count',
-            color='Admission Type',
-            title='Number of Admissions by Blood Type and Admission Type',
-            labels={'Count': 'Number of Admissions', 'Blood Type': 'Blood Type', 'Admission Type': 'Admission Type'},
-            barmode='stack'
-        )
-        blood_bar_chart_fig = apply_chart_theme(blood_bar_chart_fig)
-
-        # 10. Length of Stay Box Plot
-        stay_fig = px.box(
-            filtered_data,
-            x='Medical Condition',
-            y='Length of Stay',
-            color='Medical Condition',
-            title='Distribution of Length of Stay by Medical Condition',
-            labels={'Length of Stay': 'Length of Stay (Days)', 'Medical Condition': 'Medical Condition'}
-        )
-        stay_fig.update_layout(
-            xaxis_title='Medical Condition',
-            yaxis_title='Length of Stay (Days)',
-            showlegend=False
-        )
-        stay_fig = apply_chart_theme(stay_fig)
-
-        # 11. Data Table
-        table_data = filtered_data.to_dict('records')
-
-        # 12. Diagnosis vs Medication Heatmap
-        diag_med_pivot = filtered_data.pivot_table(
-            index='Medical Condition',
-            columns='Medication',
-            values='Name',
-            aggfunc='count',
-            fill_value=0
+    )
+    def refresh_bounds(n_intervals, version, end_date):
+        """
+        Refreshes the filter bounds once the data source has a newer version.
+        A date range reaching the last admission is extended to the new last admission.
+        """
+        data_source = current_source()
+        if version is None or version['version'] == data_source.version:
+            return (no_update,) * 7
+        bounds = data_source.bounds()
+        if end_date is not None and normalize_date(end_date) >= version['end_date']:
+            end_date = bounds.end_date
+        else:
+            end_date = no_update
+        return (
+            data_version(bounds), condition_options(bounds), gender_options(bounds),
+            bounds.min_age, bounds.max_age, age_marks(bounds), end_date
         )
-        heatmap_fig = px.imshow(
-            diag_med_pivot,
-            labels=dict(x="Medication", y="Medical Condition", color="Number of Patients"),
-            title='Diagnosis vs Medication Heatmap'
+
+    @app.callback(
+        [
+            Output('total-patients', 'children'),
+            Output('average-age', 'children'),
+            Output('total-billing', 'children'),
+            Output('average-stay', 'children'),
+            Output('summary-rendered', 'data')
+        ],
+        [
+            Input(filter_store('summary'), 'data'),
+            Input('tabs', 'value')
+        ],
+        [State('summary-rendered', 'data')]
+    )
+    def update_summary(filter_state, active_tab, rendered_key):
+        """
+        Summary Cards, skipped while their tab is hidden or the filters did not change.
+        """
+        key = filter_state_key(filter_state)
+        if filter_state is None or active_tab != 'overview' or key == rendered_key:
+            return (no_update,) * 5
+
+        data_source = current_source()
+        summary = data_source.cache.get_or_compute(f'summary:{key}', lambda: summarize(filter_state, data_source))
+        return (*summary, key)
+
+    # chart width is only known in the browser, rounded so nearby widths share cached figures
+    app.clientside_callback(
+        """
+        function(resolution, tab) {
+            var graph = document.getElementById('billing-graph');
+            var width = (graph && graph.offsetWidth) || window.innerWidth;
+            return {resolution: resolution, width: Math.round(width / 100) * 100};
+        }
+        """,
+        Output('series-view', 'data'),
+        [
+            Input('time-resolution', 'value'),
+            Input('tabs', 'value')
+        ]
+    )
+
+    for tab, graph_ids in TAB_FIGURES.items():
+        for graph_id in graph_ids:
+            register_figure_callback(app, graph_id, tab)
+
+    if CLIENT_FILTERING:
+        register_client_callbacks(app)
+
+    @app.callback(
+        [
+            Output('data-table', 'data'),
+            Output('data-table', 'page_count')
+        ],
+        [
+            Input('filter-state', 'data'),
+            Input('data-table', 'page_current'),
+            Input('data-table', 'page_size'),
+            Input('data-table', 'sort_by'),
+            Input('data-table', 'filter_query')
+        ]
+    )
+    def update_table(filter_state, page_current, page_size, sort_by, filter_query):
+        """
+        Serves only the visible page of the filtered data, the browser never gets the full frame.
+        """
+        if filter_state is None:
+            return no_update, no_update
+        with stage('table page'):
+            return current_source().table_page(filter_state, page_current, page_size, sort_by, filter_query)
+
+def filter_store(output_id):
+    """
+    Store holding the filter state the server renders `output_id` ('summary' or a graph id) for.
+    In the client-side filtering mode the browser computes the summary and the count charts for the states
+    its cube answers, the server only gets the others through 'server-filter-state'.
+    """
+    if CLIENT_FILTERING and (output_id == 'summary' or output_id in CLIENT_FIGURES):
+        return 'server-filter-state'
+    return 'filter-state'
+
+def register_client_callbacks(app):
+    """
+    Registers the callbacks of the client-side filtering mode, see `client`.
+    """
+
+    @app.callback(
+        Output('client-cube', 'data'),
+        [Input('data-version', 'data')]
+    )
+    def update_client_cube(version):
+        """
+        Ships the cube once per data version, an empty one when the browser can't use it.
+        """
+        data_source = current_source()
+        if version is None or version['version'] != data_source.version:
+            return no_update
+        return data_source.cache.get_or_compute(
+            f'client-cube:{data_source.version}', lambda: client_cube(data_source) or {}
         )
-        heatmap_fig = apply_chart_theme(heatmap_fig)
 
-        return (
-            total_patients,
-            average_age,
-            total_billing,
-            average_stay,
-            billing_fig,
-            pie_fig,
-            bar_fig,
-            stay_fig,
-            med_fig,
-            diag_fig,
-            blood_treemap_fig,
-            blood_bar_chart_fig,
-            heatmap_fig,
-            table_data
+    app.clientside_callback(
+        ClientsideFunction('health', 'routeFilterState'),
+        [
+            Output('server-filter-state', 'data'),
+            Output('client-filter-state', 'data')
+        ],
+        [
+            Input('filter-state', 'data'),
+            Input('client-cube', 'data')
+        ],
+        [State('server-filter-state', 'data')]
+    )
+
+    outputs = [
+        Output(output_id, 'children', allow_duplicate=True)
+        for output_id in ('total-patients', 'average-age', 'total-billing', 'average-stay')
+    ]
+    outputs.append(Output('summary-rendered', 'data', allow_duplicate=True))
+    for graph_id in CLIENT_FIGURES:
+        outputs.append(Output(graph_id, 'figure', allow_duplicate=True))
+        outputs.append(Output(f'{graph_id}-rendered', 'data', allow_duplicate=True))
+    app.clientside_callback(
+        ClientsideFunction('health', 'drawFilterState'),
+        outputs,
+        [Input('client-filter-state', 'data')],
+        [State('client-cube', 'data')],
+        prevent_initial_call=True
+    )
+
+def register_figure_callback(app, graph_id, tab):
+    """
+    Registers the callback of a single graph placed on `tab`.
+    The figure is only computed while its tab is active and the filter state (or its view) changed
+    since it was last rendered, otherwise `no_update` is returned.
+    The rendered store holds the key and the trace structure of the figure shown, when the new figure
+    has the same structure only its data arrays are sent, as a `Patch`.
+    """
+    inputs = [
+        Input(filter_store(graph_id), 'data'),
+        Input('tabs', 'value')
+    ]
+    view_store = FIGURE_VIEWS.get(graph_id)
+    if view_store:
+        inputs.append(Input(view_store, 'data'))
+
+    @app.callback(
+        [
+            Output(graph_id, 'figure'),
+            Output(f'{graph_id}-rendered', 'data')
+        ],
+        inputs,
+        [State(f'{graph_id}-rendered', 'data')]
+    )
+    def update_figure(filter_state, active_tab, *view_and_rendered):
+        view = view_and_rendered[0] if view_store else None
+        shown = view_and_rendered[-1] or {}
+        key = filter_state_key(filter_state)
+        if view:
+            key = f'{key}|{json.dumps(view, sort_keys=True)}'
+        if filter_state is None or active_tab != tab or key == shown.get('key'):
+            return no_update, no_update
+
+        # figures are cached serialized, equal filter states from any user share them,
+        # figures with a view only render on their own callback, their key includes the view,
+        # figures the browser may draw itself only render along with each other
+        siblings = [
+            figure_id for figure_id in TAB_FIGURES[tab]
+            if figure_id != graph_id and figure_id not in FIGURE_VIEWS
+            and filter_store(figure_id) == filter_store(graph_id)
+        ]
+        rendered = current_source().cache.get_or_compute(
+            f'figure:{graph_id}:{key}',
+            lambda: renderer.render(graph_id, filter_state, key, siblings, view, tenant_name())
         )
+        rendered_state = {'key': key, 'structure': rendered.structure}
+        if rendered.structure == shown.get('structure'):
+            return figure_patch(loads(rendered.updates_json)), rendered_state
+        return loads(rendered.figure_json), rendered_state
+
+def figure_patch(updates):
+    """
+    `Patch` setting every (path, value) of `updates` in the figure shown.
+    """
+    patch = Patch()
+    for path, value in updates:
+        target = patch
+        for part in path[:-1]:
+            target = target[part]
+        target[path[-1]] = value
+    return patch
@@ -0,0 +1,101 @@
+"""
+Client-side filtering mode, turned on with `HEALTH_CLIENTSIDE=1`.
+The browser gets a compact cube of the whole dataset once per data version ('client-cube' store) and recomputes
+the summary cards and the count charts itself (`assets/clientside.js`), without a request per filter change.
+The cube is dense over (condition, gender, age in whole years) and the dimension each chart groups by,
+so any selection of conditions and genders and any age range is answered in the browser, as long as the date range
+covers all admissions. Other filter states go to the server, as do all of them when the cube would hold more than
+`MAX_CLIENT_VALUES` values.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .encoding import loads, to_json
+
+CLIENT_FILTERING = os.environ.get('HEALTH_CLIENTSIDE', '0') == '1'
+
+# Graphs the browser draws from the cube, the billing line and the length of stay box plot always come from the server
+CLIENT_FIGURES = [
+    'admission-pie-chart',
+    'admission-bar-chart',
+    'medication-bar-chart',
+    'diagnosis-pie-chart',
+    'blood-type-treemap',
+    'blood-type-bar-chart',
+    'diagnosis-medication-heatmap',
+]
+
+MAX_CLIENT_VALUES = 500_000
+
+def dense(cells, axes, measures):
+    """
+    Flat list of `measures` summed over `axes`, (column, values) pairs, in C order with the measure innermost.
+    """
+    shape = [len(values) for _, values in axes]
+    codes = [pd.Categorical(cells[column], categories=values).codes for column, values in axes]
+    valid = np.logical_and.reduce([code >= 0 for code in codes])
+    flat = np.ravel_multi_index([code[valid] for code in codes], shape)
+    sums = np.stack([
+        np.bincount(flat, weights=cells[measure].to_numpy(dtype='float64')[valid], minlength=int(np.prod(shape)))
+        for measure in measures
+    ], axis=-1)
+    # counts and ages go as integers, sums of money keep their full precision so totals match the server's
+    if (sums % 1 == 0).all():
+        sums = sums.astype('int64')
+    return sums.ravel().tolist()
+
+def client_cube(data_source):
+    """
+    Content of the 'client-cube' store for the current data of `data_source`, None when the browser can't use one.
+    """
+    # imported here, callbacks imports this module
+    from .callbacks import normalize_filter_state, render_figure
+
+    cells = data_source.client_cells()
+    if cells is None or cells.empty:
+        return None
+    bounds = data_source.bounds()
+    categories = {
+        column: sorted(str(value) for value in cells[column].dropna().unique())
+        for column in ['Medical Condition', 'Gender', 'Admission Type', 'Blood Type', 'Medication']
+    }
+    ages = list(range(bounds.min_age, bounds.max_age + 1))
+    filters = [('Medical Condition', categories['Medical Condition']), ('Gender', categories['Gender']), ('Age', ages)]
+
+    admission_types, blood_types = categories['Admission Type'], categories['Blood Type']
+    per_filter = int(np.prod([len(values) for _, values in filters]))
+    if per_filter * (4 + 2 * len(admission_types) + len(categories['Medication'])
+                     + len(blood_types) * len(admission_types)) > MAX_CLIENT_VALUES:
+        return None
+
+    # skeletons of the charts for all the data, the browser fills in its own arrays
+    full_state = normalize_filter_state(
+        categories['Medical Condition'], [bounds.min_age, bounds.max_age], categories['Gender'],
+        bounds.start_date, bounds.end_date, bounds.version
+    )
+    figures = {
+        graph_id: loads(to_json(render_figure(graph_id, full_state, data_source=data_source).figure))
+        for graph_id in CLIENT_FIGURES
+    }
+    return {
+        'version': bounds.version,
+        'start_date': full_state['start_date'],
+        'end_date': full_state['end_date'],
+        'min_age': bounds.min_age,
+        'ages': len(ages),
+        'conditions': categories['Medical Condition'],
+        'genders': categories['Gender'],
+        'admission_types': admission_types,
+        'blood_types': blood_types,
+        'medications': categories['Medication'],
+        'summary': dense(cells, filters, ['Count', 'Age Sum', 'Billing Amount Sum', 'Length of Stay Sum']),
+        'admission': dense(cells, filters + [('Admission Type', admission_types)], ['Count', 'Billing Amount Sum']),
+        'medication': dense(cells, filters + [('Medication', categories['Medication'])], ['Count']),
+        'blood': dense(
+            cells, filters + [('Blood Type', blood_types), ('Admission Type', admission_types)], ['Count']
+        ),
+        'figure_ids': CLIENT_FIGURES,
+        'figures': figures,
+    }
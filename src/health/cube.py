@@ -0,0 +1,133 @@
+"""
+Pre-aggregated data cube, so the count and sum charts don't group the raw rows on every request.
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Age slider moves by whole years, one bucket per year keeps every slider position answerable
+AGE_BUCKET_WIDTH = 1
+
+CUBE_DIMENSIONS = [
+    'Month',
+    'Medical Condition',
+    'Gender',
+    'Age Bucket',
+    'Admission Type',
+    'Blood Type',
+    'Medication'
+]
+
+CUBE_MEASURES = ['Billing Amount', 'Length of Stay', 'Age']
+
+def build_cells(rows, age_bucket_width=AGE_BUCKET_WIDTH):
+    """
+    Groups admission rows by `CUBE_DIMENSIONS` into cells holding
+    'Count' plus the sum and sum of squares of every column in `CUBE_MEASURES`.
+    Text dimensions are categoricals, which keeps the cells small.
+    """
+    frame = pd.DataFrame({
+        'Month': rows['Date of Admission'].dt.to_period('M').dt.to_timestamp(),
+        'Medical Condition': rows['Medical Condition'].astype('category'),
+        'Gender': rows['Gender'].astype('category'),
+        'Age Bucket': rows['Age'] // age_bucket_width * age_bucket_width,
+        'Admission Type': rows['Admission Type'].astype('category'),
+        'Blood Type': rows['Blood Type'].astype('category'),
+        'Medication': rows['Medication'].astype('category'),
+        'Count': 1
+    })
+    for measure in CUBE_MEASURES:
+        values = rows[measure].astype('float64')
+        frame[f'{measure} Sum'] = values
+        frame[f'{measure} Sum of Squares'] = values ** 2
+
+    return frame.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False).sum().reset_index()
+
+def combine_cells(parts):
+    """
+    Merges cell frames of disjoint row sets into one, summing cells with equal keys.
+    """
+    columns = {}
+    for column in parts[0].columns:
+        values = [part[column] for part in parts]
+        if isinstance(values[0].dtype, pd.CategoricalDtype):
+            # plain concat would fall back to object columns when the categories differ
+            columns[column] = union_categoricals(values)
+        else:
+            columns[column] = pd.concat(values, ignore_index=True)
+    cells = pd.DataFrame(columns)
+    return cells.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=False).sum().reset_index()
+
+class DataCube:
+    """
+    Cells of the whole dataset, built once at load time.
+    `slice` answers filter states whose bounds fall on bucket boundaries in O(cells),
+    other filter states have to be aggregated from the raw rows with `build_cells`.
+    """
+
+    def __init__(self, data, age_bucket_width=AGE_BUCKET_WIDTH, cells=None):
+        self.age_bucket_width = age_bucket_width
+        # cells can come precomputed, e.g. accumulated chunk by chunk while streaming the CSV
+        self.cells = build_cells(data, age_bucket_width) if cells is None else cells
+
+        ages = data['Age'].dropna()
+        dates = data['Date of Admission'].dropna()
+        self.min_age, self.max_age = (ages.min(), ages.max()) if len(ages) else (0, 0)
+        self.min_date, self.max_date = (dates.min(), dates.max()) if len(dates) else (pd.NaT, pd.NaT)
+        # buckets only split the data exactly when no value falls inside one
+        self.whole_ages = bool((ages % 1 == 0).all())
+        self.whole_days = bool((dates == dates.dt.normalize()).all())
+
+    def _age_aligned(self, low, high):
+        if low > self.min_age and not (self.whole_ages and low % self.age_bucket_width == 0):
+            return False
+        if high < self.max_age and not (self.whole_ages and (high + 1) % self.age_bucket_width == 0):
+            return False
+        return True
+
+    def _date_aligned(self, start_date, end_date):
+        if start_date is not None and start_date > self.min_date and start_date.day != 1:
+            return False
+        if end_date is not None and end_date < self.max_date:
+            if not self.whole_days or (end_date + pd.Timedelta(days=1)).day != 1:
+                return False
+        return True
+
+    def covers(self, filter_state):
+        """
+        True when the age and date bounds of the filter state fall on bucket boundaries
+        or outside of the data.
+        """
+        start_date, end_date = self._dates(filter_state)
+        low, high = filter_state['age']
+        return self._age_aligned(low, high) and self._date_aligned(start_date, end_date)
+
+    def _dates(self, filter_state):
+        start_date = filter_state['start_date']
+        end_date = filter_state['end_date']
+        return (
+            pd.Timestamp(start_date) if start_date is not None else None,
+            pd.Timestamp(end_date) if end_date is not None else None
+        )
+
+    def slice(self, filter_state):
+        """
+        Returns the cells matching the filter state, None when the cube can't answer it exactly.
+        """
+        if not self.covers(filter_state):
+            return None
+
+        cells = self.cells
+        start_date, end_date = self._dates(filter_state)
+        low, high = filter_state['age']
+
+        mask = (
+            cells['Medical Condition'].isin(filter_state['conditions']) &
+            cells['Gender'].isin(filter_state['genders']) &
+            (cells['Age Bucket'] >= low // self.age_bucket_width * self.age_bucket_width) &
+            (cells['Age Bucket'] <= high)
+        )
+        if start_date is not None:
+            mask &= cells['Month'] >= start_date.to_period('M').to_timestamp()
+        if end_date is not None:
+            mask &= cells['Month'] <= end_date.to_period('M').to_timestamp()
+        return cells[mask]
@@ -1,23 +1,91 @@
 """
-File handling preprocessing, made file for possible scalability if more data would require aggregation
+File handling preprocessing, made file for possible scalability if more data would require aggregation.
+Nothing is loaded on import, the dataset is loaded by the first `get_dataset()` call and can grow by `provider.refresh()`.
 """
+import hashlib
+import io
+import logging
+import mmap
 import os
+import threading
+from collections import OrderedDict, defaultdict
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .cube import DataCube, build_cells, combine_cells
+from .index import FilterIndex
+from .storage import columns_path, is_current, read_columns
+from .timing import startup_phase
+
+try:
+    import pyarrow  # noqa: F401
+    # arrow strings keep the text in one buffer instead of a Python object per value
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = 'category'
+
+logger = logging.getLogger(__name__)
 
-def load_data(csv_path=None):
+# Text columns with fewer distinct values than this share of rows become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+# Month and quarter end frequencies, pandas 2.2 renamed them and deprecated 'M' and 'Q'
+if tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2):
+    MONTH_END, QUARTER_END = 'ME', 'QE'
+else:
+    MONTH_END, QUARTER_END = 'M', 'Q'
+
+def default_csv_path():
     """
-    Loads the hospital_data.csv from the data folder, applies preprocessing,
-    and returns two DataFrames: data and monthly_data.
+    Path of data/hospital_data.csv in the project root.
     """
-    if csv_path is None:
-        # Use an OS-agnostic way to reference the CSV
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        default_csv_path = os.path.join(current_dir, '..', '..', 'data', 'hospital_data.csv')
-        csv_path = default_csv_path
+    # Use an OS-agnostic way to reference the CSV
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, '..', '..', 'data', 'hospital_data.csv')
 
+class _FileHead(io.RawIOBase):
+    """
+    The first `size` bytes of a binary file, a parse of it ends there even while rows are appended behind.
+    """
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.f.readinto(memoryview(buffer)[:max(min(len(buffer), self.remaining), 0)])
+        self.remaining -= count
+        return count
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+def open_csv(csv_path, size=None):
+    """
+    Opens the CSV for parsing, only its first `size` bytes when given.
+    """
+    f = open(csv_path, 'rb')
+    return f if size is None else io.BufferedReader(_FileHead(f, size))
+
+def read_csv(csv_path, size=None):
+    """
+    Parses the CSV (its first `size` bytes when given) and applies preprocessing.
+    """
     # Load the data
-    data = pd.read_csv(csv_path)
+    with open_csv(csv_path, size) as f:
+        data = pd.read_csv(f)
+    return preprocess(data)
 
+def preprocess(data):
+    """
+    Parses dates and numbers in place and adds 'Length of Stay', also used per chunk when streaming.
+    """
     # Data preprocessing
     data['Date of Admission'] = pd.to_datetime(data['Date of Admission'])
     data['Discharge Date'] = pd.to_datetime(data['Discharge Date'])
@@ -25,12 +93,553 @@ def load_data(csv_path=None):
     data['Age'] = pd.to_numeric(data['Age'], errors='coerce')
     data['Length of Stay'] = (data['Discharge Date'] - data['Date of Admission']).dt.days
 
-    # Aggregate data
-    monthly_data = data.groupby([
-        pd.Grouper(key='Date of Admission', freq='M'),
+    return data
+
+def optimize_dtypes(data):
+    """
+    Returns `data` with compact dtypes and unchanged values:
+    categoricals for low-cardinality text, arrow strings (or categoricals without pyarrow) for the rest,
+    and integers downcast to the smallest type holding them. Floats stay float64, so sums don't change.
+    """
+    optimized = {}
+    for name in data.columns:
+        column = data[name]
+        if isinstance(column.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(column):
+            optimized[name] = column
+        elif pd.api.types.is_integer_dtype(column):
+            optimized[name] = pd.to_numeric(column, downcast='integer')
+        elif pd.api.types.is_float_dtype(column):
+            # whole numbers without gaps, such as an 'Age' parsed as float, become integers
+            if column.notna().all() and (column % 1 == 0).all():
+                optimized[name] = pd.to_numeric(column.astype('int64'), downcast='integer')
+            else:
+                optimized[name] = column
+        elif column.nunique() < CATEGORY_MAX_RATIO * len(column):
+            optimized[name] = column.astype('category')
+        else:
+            optimized[name] = column.astype(STRING_DTYPE)
+    return pd.DataFrame(optimized, index=data.index)
+
+def memory_report(data):
+    """
+    Deep memory usage of every column in bytes, with its dtype, largest first.
+    """
+    usage = data.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'dtype': data.dtypes.astype(str),
+        'bytes': usage
+    }).sort_values('bytes', ascending=False)
+
+def is_mapped(array):
+    """
+    True when the numpy `array` is a view of a memory-mapped file.
+    """
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+def aggregate_monthly(data):
+    """
+    Number of admissions per month and medical condition.
+    """
+    return data.groupby([
+        pd.Grouper(key='Date of Admission', freq=MONTH_END),
+        'Medical Condition'
+    ], observed=True).size().reset_index(name='Count')
+
+def aggregate_daily(data):
+    """
+    Number of admissions per day and medical condition, the finest level of the time series.
+    """
+    return data.groupby([
+        pd.Grouper(key='Date of Admission', freq='D'),
         'Medical Condition'
-    ]).size().reset_index(name='Count')
+    ], observed=True).size().reset_index(name='Count')
+
+def merge_counts(parts):
+    """
+    Sums count frames (see `aggregate_daily`) of disjoint row sets into one.
+    """
+    return pd.concat(parts).groupby(
+        ['Date of Admission', 'Medical Condition'], observed=True
+    )['Count'].sum().reset_index()
+
+def roll_up(daily_data, freq):
+    """
+    Sums daily counts into buckets of the pandas frequency `freq`, labelled by their last day.
+    """
+    return daily_data.groupby([
+        pd.Grouper(key='Date of Admission', freq=freq),
+        'Medical Condition'
+    ], observed=True)['Count'].sum().reset_index()
+
+# Time series levels, finest first, with the pandas frequency of their buckets
+TIME_RESOLUTIONS = OrderedDict([('day', 'D'), ('week', 'W'), ('month', MONTH_END), ('quarter', QUARTER_END)])
+# Most points drawn by a time series chart over all its lines
+SERIES_POINT_BUDGET = 2000
+# Horizontal pixels per point, so a wider chart gets a finer level
+PIXELS_PER_POINT = 3
+DEFAULT_CHART_WIDTH = 1200
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling, returns the positions of the `threshold` points kept.
+    The first and last points are always kept, from every bucket in between the point forming
+    the largest triangle with the previously kept point and the average of the next bucket.
+    """
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    every = (size - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+class TimeSeriesStore:
+    """
+    Admission counts per medical condition at every level of `TIME_RESOLUTIONS`, rolled up from daily counts.
+    `query` picks the level for a date span and chart width, so a chart stays under the point budget.
+    """
+
+    def __init__(self, daily_data):
+        self.levels = OrderedDict(
+            (level, daily_data if freq == 'D' else roll_up(daily_data, freq))
+            for level, freq in TIME_RESOLUTIONS.items()
+        )
+
+    def select(self, level, conditions, start_date=None, end_date=None):
+        """
+        Rows of `level` for the selected conditions and dates.
+        """
+        series = self.levels[level]
+        mask = series['Medical Condition'].isin(conditions)
+        if start_date is not None:
+            mask &= series['Date of Admission'] >= start_date
+        if end_date is not None:
+            mask &= series['Date of Admission'] <= end_date
+        return series[mask]
+
+    def query(self, conditions, start_date=None, end_date=None, resolution='auto', width=DEFAULT_CHART_WIDTH):
+        """
+        Returns (series, level). With `resolution` 'auto' the finest level whose longest line fits
+        the points available to it is used, lines still above that (an explicit fine `resolution`,
+        or a very long span) are downsampled with LTTB.
+        """
+        max_points = max(3, min(width // PIXELS_PER_POINT, SERIES_POINT_BUDGET // max(1, len(conditions))))
+        levels = list(self.levels) if resolution == 'auto' else [resolution]
+        for level in levels:
+            series = self.select(level, conditions, start_date, end_date)
+            lengths = series.groupby('Medical Condition', observed=True).size()
+            if lengths.empty or lengths.max() <= max_points:
+                return series, level
+        return self._downsample(series, max_points), level
+
+    @staticmethod
+    def _downsample(series, max_points):
+        parts = []
+        for _, line in series.groupby('Medical Condition', observed=True):
+            dates = line['Date of Admission'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            parts.append(line.iloc[lttb(dates, line['Count'].to_numpy(), max_points)])
+        return pd.concat(parts)
+
+# Streaming ingestion settings
+DEFAULT_CHUNKSIZE = 100_000
+DATE_COLUMNS = ['Date of Admission', 'Discharge Date']
+NUMERIC_COLUMNS = ['Age', 'Billing Amount', 'Room Number']
+# Cell frames collected before they are merged, bounds the memory held by partial aggregates
+CELL_PARTS_TO_COMBINE = 8
+# Bytes from each end of the CSV hashed into the data version
+VERSION_SAMPLE_BYTES = 65536
+
+class _Dictionary:
+    """
+    Dictionary encoding of one text column across chunks, every distinct value is stored once.
+    """
+
+    def __init__(self):
+        # value -> code, and the values in code order
+        self.codes = {}
+        self.values = []
+
+    def encode(self, column):
+        """
+        Returns int32 codes of the chunk column, -1 for missing values.
+        """
+        local_codes, uniques = pd.factorize(column)
+        # only the distinct values of the chunk are looked up in the dictionary
+        global_codes = np.fromiter(
+            (self.codes.get(value, -1) for value in uniques), dtype=np.int32, count=len(uniques)
+        )
+        new = global_codes == -1
+        if new.any():
+            start = len(self.values)
+            global_codes[new] = np.arange(start, start + new.sum())
+            self.values.extend(uniques[new])
+            self.codes.update(zip(uniques[new], range(start, len(self.values))))
+        return np.append(global_codes, -1).astype(np.int32)[local_codes]
+
+    def decode(self, codes):
+        """
+        Categorical of the joined codes, with sorted categories like the other loaders produce.
+        """
+        values = np.array(self.values, dtype=object)
+        order = np.argsort(values, kind='stable')
+        ranks = np.empty(len(values) + 1, dtype=np.int32)
+        ranks[order] = np.arange(len(values), dtype=np.int32)
+        ranks[-1] = -1
+        return pd.Categorical.from_codes(ranks[codes], values[order])
+
+def _compact_numbers(pieces):
+    """
+    Joins float32 chunk pieces, integers without missing values are downcast to int16.
+    """
+    values = np.concatenate(pieces)
+    if values.size and not np.isnan(values).any() and (values % 1 == 0).all():
+        if values.min() >= np.iinfo(np.int16).min and values.max() <= np.iinfo(np.int16).max:
+            return values.astype(np.int16)
+    return values
+
+def stream_csv(csv_path, chunksize=DEFAULT_CHUNKSIZE, size=None):
+    """
+    Reads the CSV (its first `size` bytes when given) `chunksize` rows at a time for datasets larger than memory.
+    Every chunk is preprocessed, aggregated into daily counts and cube cells, and then only kept in
+    compact form (text dictionary-encoded into categoricals, numbers as float32 or int16).
+    Peak memory is one raw chunk plus the compact columns and the aggregates.
+    Returns (data, daily_data, cells).
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    text_columns = [
+        column for column in header
+        if column not in DATE_COLUMNS and column not in NUMERIC_COLUMNS
+    ]
+    dictionaries = {column: _Dictionary() for column in text_columns}
+
+    pieces = defaultdict(list)
+    daily_parts = []
+    cell_parts = []
+
+    with open_csv(csv_path, size) as f:
+        for chunk in pd.read_csv(f, chunksize=chunksize, dtype={column: str for column in text_columns}):
+            for column in NUMERIC_COLUMNS:
+                if column in chunk:
+                    chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+            chunk = preprocess(chunk)
+
+            daily_parts.append(aggregate_daily(chunk))
+            cell_parts.append(build_cells(chunk))
+            if len(cell_parts) >= CELL_PARTS_TO_COMBINE:
+                cell_parts = [combine_cells(cell_parts)]
+
+            for column in chunk.columns:
+                if column in dictionaries:
+                    pieces[column].append(dictionaries[column].encode(chunk[column]))
+                elif pd.api.types.is_datetime64_any_dtype(chunk[column]):
+                    pieces[column].append(chunk[column].to_numpy(dtype='datetime64[ns]'))
+                else:
+                    pieces[column].append(chunk[column].to_numpy(dtype='float32'))
+            del chunk
+
+    columns = {}
+    for column in list(pieces):
+        # pieces are dropped column by column, so only one column is ever held twice
+        parts = pieces.pop(column)
+        if column in dictionaries:
+            columns[column] = dictionaries[column].decode(np.concatenate(parts))
+        elif parts[0].dtype.kind == 'M':
+            columns[column] = np.concatenate(parts)
+        else:
+            columns[column] = _compact_numbers(parts)
+        del parts
+    data = pd.DataFrame(columns, copy=False)
+
+    daily_data = merge_counts(daily_parts)
+    cells = combine_cells(cell_parts)
+
+    return data, daily_data, cells
+
+def load_data(csv_path=None, size=None):
+    """
+    Loads the hospital_data.csv from the data folder (its first `size` bytes when given), applies preprocessing,
+    and returns two DataFrames: data and monthly_data.
+    When `dashboard-ingest` converted the CSV, the columnar copy is memory-mapped instead of parsing it.
+    """
+    if csv_path is None:
+        csv_path = default_csv_path()
+
+    columns_dir = columns_path(csv_path)
+    if is_current(columns_dir, csv_path):
+        # stored columns already are compact, converting them would copy the mapped pages
+        with startup_phase('load'):
+            data = read_columns(columns_dir)
+    else:
+        with startup_phase('load'):
+            data = read_csv(csv_path, size)
+        with startup_phase('dtype optimization'):
+            optimized = optimize_dtypes(data)
+        if logger.isEnabledFor(logging.DEBUG):
+            before, after = memory_report(data), memory_report(optimized)
+            logger.debug(
+                'Optimized dtypes, %.1f MiB -> %.1f MiB\n%s',
+                before['bytes'].sum() / 2 ** 20, after['bytes'].sum() / 2 ** 20, after.to_string()
+            )
+        data = optimized
+
+    # Aggregate data
+    with startup_phase('aggregation'):
+        monthly_data = aggregate_monthly(data)
 
     return data, monthly_data
 
-data, monthly_data = load_data()
+class Dataset:
+    """
+    Loaded data together with everything derived from it, the filter index, the data cube and the time series.
+    """
+
+    def __init__(self, data, monthly_data, cells=None, daily_data=None):
+        with startup_phase('preprocessing'):
+            self.data = data
+            self.monthly_data = monthly_data
+            self.filter_index = FilterIndex(data)
+            self.cube = DataCube(data, cells=cells)
+            self.time_series = TimeSeriesStore(aggregate_daily(data) if daily_data is None else daily_data)
+
+    def memory_usage(self):
+        """
+        Returns (private, mapped) bytes of the dataset. Mapped bytes are columns memory-mapped from the columnar copy,
+        their pages are shared by every process mapping the same files. Private bytes are everything built
+        in this process: columns read from the CSV, the filter index, the cube cells and the time series.
+        """
+        private = mapped = 0
+        for name in self.data.columns:
+            column = self.data[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                values = column.array.codes
+                extra = column.cat.categories.memory_usage(deep=True)
+            else:
+                values, extra = column.to_numpy(), 0
+            if is_mapped(values):
+                mapped += values.nbytes
+                private += extra
+            else:
+                private += column.memory_usage(deep=True, index=False)
+        frames = [self.monthly_data, self.cube.cells, *self.time_series.levels.values()]
+        private += sum(int(frame.memory_usage(deep=True).sum()) for frame in frames)
+        private += self.filter_index.nbytes
+        return int(private), int(mapped)
+
+def load_dataset(csv_path=None, chunksize=None, size=None):
+    """
+    Loads a `Dataset`, streaming the CSV in chunks when `chunksize` is given
+    and no current columnar copy exists. `size` limits the CSV parse to its first bytes.
+    """
+    if csv_path is None:
+        csv_path = default_csv_path()
+    if chunksize and not is_current(columns_path(csv_path), csv_path):
+        with startup_phase('load'):
+            data, daily_data, cells = stream_csv(csv_path, chunksize, size)
+        return Dataset(data, roll_up(daily_data, MONTH_END), cells, daily_data)
+    return Dataset(*load_data(csv_path, size))
+
+def _append_column(column, new_values):
+    """
+    `column` followed by `new_values`, in the compact dtype of `column` when the new values fit it.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return union_categoricals([column, pd.Categorical(new_values)], sort_categories=True)
+    if pd.api.types.is_datetime64_any_dtype(column):
+        new_values = pd.to_datetime(new_values)
+    elif pd.api.types.is_integer_dtype(column):
+        new_values = pd.to_numeric(new_values, errors='coerce')
+        limits = np.iinfo(column.dtype)
+        if new_values.notna().all() and (new_values % 1 == 0).all() and new_values.between(limits.min, limits.max).all():
+            new_values = new_values.astype(column.dtype)
+    elif pd.api.types.is_float_dtype(column):
+        new_values = pd.to_numeric(new_values, errors='coerce').astype(column.dtype)
+    else:
+        new_values = new_values.astype(column.dtype)
+    return pd.concat([column, new_values], ignore_index=True)
+
+def append_rows(dataset, rows):
+    """
+    Returns a new `Dataset` with the preprocessed `rows` appended to `dataset`, which is left unchanged.
+    Monthly and daily counts and the cube cells are updated from the new rows only,
+    the filter index is rebuilt.
+    """
+    rows = rows.reindex(columns=dataset.data.columns)
+    data = pd.DataFrame({
+        column: _append_column(dataset.data[column], rows[column])
+        for column in dataset.data.columns
+    }, copy=False)
+    monthly_data = merge_counts([dataset.monthly_data, aggregate_monthly(rows)])
+    daily_data = merge_counts([dataset.time_series.levels['day'], aggregate_daily(rows)])
+    cells = combine_cells([dataset.cube.cells, build_cells(rows)])
+    return Dataset(data, monthly_data, cells, daily_data)
+
+def read_appended(csv_path, offset):
+    """
+    Rows appended to the CSV after its first `offset` bytes, and the offset after them.
+    Only complete lines are read, a line still being written is picked up by the next call.
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        appended = f.read()
+    end = appended.rfind(b'\n') + 1
+    if end == 0:
+        return None, offset
+    header = pd.read_csv(csv_path, nrows=0).columns
+    rows = pd.read_csv(io.BytesIO(appended[:end]), header=None, names=header)
+    return (rows if len(rows) else None), offset + end
+
+def content_version(csv_path, offset, incoming_files=()):
+    """
+    Version of the data read from the first `offset` bytes of `csv_path` and the `incoming_files`.
+    It is derived from the content, so every process (and every restart) reading the same data gets the same
+    version, and results cached under it can be shared between them. The first and last `VERSION_SAMPLE_BYTES`
+    of the CSV part stand in for its content, incoming files for their name and size.
+    """
+    digest = hashlib.sha1(f'{os.path.abspath(csv_path)}:{offset}'.encode('utf-8'))
+    with open(csv_path, 'rb') as f:
+        digest.update(f.read(min(offset, VERSION_SAMPLE_BYTES)))
+        f.seek(max(offset - VERSION_SAMPLE_BYTES, 0))
+        digest.update(f.read(offset - f.tell()))
+    for path in sorted(incoming_files):
+        digest.update(f'{os.path.basename(path)}:{os.path.getsize(path)}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class DataProvider:
+    """
+    Loads the dataset once, on the first `get()` from any thread.
+    `chunksize` switches to the streaming CSV ingestion, see `stream_csv`.
+    `refresh()` picks up rows appended to the CSV and CSV files added to `incoming_dir`.
+    `version` identifies the data loaded, see `content_version`, it is None before the first load.
+    """
+
+    def __init__(self, csv_path=None, chunksize=None, incoming_dir=None):
+        self.csv_path = csv_path or default_csv_path()
+        self.chunksize = chunksize
+        self.incoming_dir = incoming_dir
+        self.version = None
+        self._dataset = None
+        self._offset = 0
+        self._loaded_files = set()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._dataset is not None
+
+    @property
+    def dataset(self):
+        """
+        The loaded `Dataset` without loading it, None when not loaded.
+        """
+        return self._dataset
+
+    def _incoming_files(self):
+        if not self.incoming_dir or not os.path.isdir(self.incoming_dir):
+            return []
+        return sorted(
+            os.path.join(self.incoming_dir, name)
+            for name in os.listdir(self.incoming_dir) if name.endswith('.csv')
+        )
+
+    def _new_rows(self):
+        # rows appended to the CSV and rows of incoming files not loaded yet, preprocessed
+        parts = []
+        if os.path.getsize(self.csv_path) > self._offset:
+            rows, self._offset = read_appended(self.csv_path, self._offset)
+            if rows is not None:
+                parts.append(rows)
+        for path in self._incoming_files():
+            if path not in self._loaded_files:
+                parts.append(pd.read_csv(path))
+                self._loaded_files.add(path)
+        if not parts:
+            return None
+        return preprocess(pd.concat(parts, ignore_index=True))
+
+    def _load(self):
+        # the parse stops at the size taken first, rows appended during the load are read from there
+        self._offset = os.path.getsize(self.csv_path)
+        self._loaded_files = set()
+        dataset = load_dataset(self.csv_path, self.chunksize, self._offset)
+        rows = self._new_rows()
+        return dataset if rows is None else append_rows(dataset, rows)
+
+    def get(self):
+        """
+        Returns the `Dataset`, loading it first when needed. Concurrent callers wait for one load.
+        """
+        if self._dataset is None:
+            with self._lock:
+                if self._dataset is None:
+                    self._dataset = self._load()
+                    self.version = content_version(self.csv_path, self._offset, self._loaded_files)
+        return self._dataset
+
+    def unload(self):
+        """
+        Drops the loaded dataset, the next `get()` loads it again. Callers holding the `Dataset` keep using it.
+        """
+        with self._lock:
+            self._dataset = None
+
+    def refresh(self):
+        """
+        Appends new rows and swaps the dataset in one assignment, callers holding the previous `Dataset`
+        keep a consistent view. A CSV that shrank is reloaded in full. Returns True when the dataset changed.
+        """
+        if self._dataset is None:
+            return False
+        with self._lock:
+            # unloaded while waiting for the lock, e.g. by the tenant registry
+            if self._dataset is None:
+                return False
+            if os.path.getsize(self.csv_path) < self._offset:
+                dataset = self._load()
+            else:
+                rows = self._new_rows()
+                if rows is None:
+                    return False
+                dataset = append_rows(self._dataset, rows)
+            self._dataset = dataset
+            self.version = content_version(self.csv_path, self._offset, self._loaded_files)
+        logger.info('Dataset refreshed to version %s, %d rows', self.version, len(dataset.data))
+        return True
+
+# HEALTH_CSV_PATH replaces data/hospital_data.csv, HEALTH_CSV_CHUNKSIZE=<rows> streams the CSV instead of reading
+# it at once, CSV files put into HEALTH_INCOMING_DIR are appended to the data
+provider = DataProvider(
+    csv_path=os.environ.get('HEALTH_CSV_PATH') or None,
+    chunksize=int(os.environ.get('HEALTH_CSV_CHUNKSIZE', 0)) or None,
+    incoming_dir=os.environ.get('HEALTH_INCOMING_DIR') or None
+)
+
+def get_dataset():
+    """
+    Returns the loaded `Dataset` of the default provider.
+    """
+    return provider.get()
+
+def __getattr__(name):
+    # `from .data import data` still works, it loads the dataset on first access
+    if name in ('data', 'monthly_data', 'filter_index', 'cube', 'time_series'):
+        return getattr(get_dataset(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
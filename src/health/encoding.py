@@ -0,0 +1,77 @@
+"""
+Serialization of the payloads sent to the browser.
+With `HEALTH_PAYLOAD_ENCODING=binary` numeric arrays of figures are sent as plotly typed arrays
+(`{'dtype': 'f8', 'bdata': <base64>}`, decoded by plotly.js 2.28 and newer) instead of JSON number lists,
+`json` (the default) keeps plain lists.
+JSON is encoded and decoded with orjson when it is installed, plotly (and so Dash) picks it up on its own.
+"""
+import base64
+import json
+import os
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+PAYLOAD_ENCODINGS = ('json', 'binary')
+
+# numpy kinds and sizes plotly.js has typed arrays for
+TYPED_ARRAY_DTYPES = {
+    ('f', 8): 'f8', ('f', 4): 'f4',
+    ('i', 4): 'i4', ('i', 2): 'i2', ('i', 1): 'i1',
+    ('u', 4): 'u4', ('u', 2): 'u2', ('u', 1): 'u1',
+}
+# integers are sent in the smallest of these types holding all values, doubles otherwise
+INTEGER_TYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32]
+
+def payload_encoding():
+    encoding = os.environ.get('HEALTH_PAYLOAD_ENCODING', 'json')
+    if encoding not in PAYLOAD_ENCODINGS:
+        raise ValueError(f"Unknown HEALTH_PAYLOAD_ENCODING '{encoding}', use 'json' or 'binary'")
+    return encoding
+
+def typed_array(array):
+    """
+    Plotly typed array spec of a numeric numpy `array`, None when plotly.js has no typed array for it.
+    """
+    if array.dtype.kind in 'iu':
+        low, high = (array.min(), array.max()) if array.size else (0, 0)
+        narrowest = next(
+            (int_type for int_type in INTEGER_TYPES
+             if np.iinfo(int_type).min <= low and high <= np.iinfo(int_type).max),
+            np.float64
+        )
+        array = array.astype(narrowest)
+    dtype = TYPED_ARRAY_DTYPES.get((array.dtype.kind, array.dtype.itemsize))
+    if dtype is None or array.ndim > 2:
+        return None
+    spec = {'dtype': dtype, 'bdata': base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii')}
+    if array.ndim == 2:
+        spec['shape'] = f'{array.shape[0]}, {array.shape[1]}'
+    return spec
+
+def binary_arrays(value):
+    """
+    Copy of the figure (or part of it) `value` with its numeric numpy arrays replaced by typed array specs.
+    """
+    if isinstance(value, np.ndarray):
+        spec = typed_array(value)
+        return value if spec is None else spec
+    if isinstance(value, dict):
+        return {key: binary_arrays(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [binary_arrays(item) for item in value]
+    return value
+
+def to_json(value, encoding='json'):
+    """
+    JSON of a figure dict, or of figure updates, in the payload `encoding`.
+    """
+    if encoding == 'binary':
+        value = binary_arrays(value)
+    return to_json_plotly(value)
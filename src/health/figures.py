@@ -0,0 +1,388 @@
+"""
+Figure builders for every `dcc.Graph` in the layout, one function per chart.
+They only read the aggregates they are given, filtering happens in the data source (see `sources`).
+Most charts are built from cube cells (see `cube.build_cells`), counts come from the 'Count' column.
+The box plot sends statistics computed from a histogram, no chart needs the raw rows.
+
+Plotly express only runs once per chart and trace structure (the traces a chart has, e.g. one per selected condition):
+the figure it builds is kept as a skeleton, every `*_traces` function gives the structure and the data arrays
+of its chart, which `build_figure` fills into the skeleton. The arrays alone are what the callbacks send
+as a `Patch` when the browser already shows a figure of the same structure.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from itertools import cycle
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from .theme import apply_chart_theme
+
+# Chart title wording of every time series level
+RESOLUTION_LABELS = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly', 'quarter': 'Quarterly'}
+
+# Skeletons kept per process, structures rarely change so few are needed
+MAX_SKELETONS = 256
+
+# Figure dict of a chart, the token of its trace structure and the (path, value) updates it was filled with
+FigureUpdate = namedtuple('FigureUpdate', ['structure', 'figure', 'updates'])
+
+def billing_title(level):
+    return f'Billing Amount Over Time ({RESOLUTION_LABELS[level]} Aggregation)'
+
+def billing_figure(series, level='month'):
+    """
+    Billing Line Chart, built from the time series at `level`.
+    """
+    billing_fig = px.line(
+        series,
+        x='Date of Admission',
+        y='Count',
+        color='Medical Condition',
+        title=billing_title(level),
+        labels={'Count': 'Number of Admissions', 'Date of Admission': 'Admission Date'}
+    )
+    return apply_chart_theme(billing_fig)
+
+def billing_traces(series, level='month'):
+    # one line per condition, in order of appearance, drawn with WebGL by plotly express past 1000 points
+    structure, updates = [len(series) > 1000], [(('layout', 'title', 'text'), billing_title(level))]
+    for index, (condition, part) in enumerate(series.groupby('Medical Condition', observed=True, sort=False)):
+        structure.append(str(condition))
+        updates.append((('data', index, 'x'), part['Date of Admission'].to_numpy()))
+        updates.append((('data', index, 'y'), part['Count'].to_numpy()))
+    return structure, updates
+
+def admission_pie_figure(cells):
+    """
+    Admission Type Pie Chart.
+    """
+    admission_counts = cells.groupby('Admission Type', observed=True)['Count'].sum().reset_index()
+    pie_fig = px.pie(
+        admission_counts,
+        names='Admission Type',
+        values='Count',
+        title='Admission Types Distribution',
+        hole=0.4
+    )
+    pie_fig.update_traces(textposition='outside', textinfo='percent+label')
+    return apply_chart_theme(pie_fig)
+
+def pie_traces(cells, column):
+    counts = cells.groupby(column, observed=True)['Count'].sum()
+    return [counts.empty], [
+        (('data', 0, 'labels'), counts.index.to_numpy(dtype=object)),
+        (('data', 0, 'values'), counts.to_numpy())
+    ]
+
+def admission_pie_traces(cells):
+    return pie_traces(cells, 'Admission Type')
+
+def category_bar_traces(totals):
+    # one single bar trace per category, the categories and their order are the structure
+    return [str(category) for category in totals.index], [
+        (('data', index, 'y'), np.array([value])) for index, value in enumerate(totals.to_numpy())
+    ]
+
+def admission_bar_figure(cells):
+    """
+    Admission Type Bar Chart.
+    """
+    bar_data = cells.groupby('Admission Type', observed=True)['Billing Amount Sum'].sum().reset_index(name='Billing Amount')
+    bar_fig = px.bar(
+        bar_data,
+        x='Admission Type',
+        y='Billing Amount',
+        color='Admission Type',
+        title='Total Billing Amount by Admission Type',
+        labels={
+            'Billing Amount': 'Total Billing Amount ($)',
+            'Admission Type': 'Admission Type'
+        }
+    )
+    bar_fig.update_layout(showlegend=False)
+    return apply_chart_theme(bar_fig)
+
+def admission_bar_traces(cells):
+    return category_bar_traces(cells.groupby('Admission Type', observed=True)['Billing Amount Sum'].sum())
+
+def medication_bar_figure(cells):
+    """
+    Medication Bar Chart.
+    """
+    med_counts = cells.groupby('Medication', observed=True)['Count'].sum().reset_index()
+    med_counts = med_counts.sort_values('Count', ascending=False, kind='stable')
+    med_fig = px.bar(
+        med_counts,
+        x='Medication',
+        y='Count',
+        title='Medication Counts',
+        labels={'Medication': 'Medication', 'Count': 'Number of Prescriptions'},
+        color='Medication',
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    return apply_chart_theme(med_fig)
+
+def medication_bar_traces(cells):
+    med_counts = cells.groupby('Medication', observed=True)['Count'].sum().reset_index()
+    # stable, tied medications keep their order as in the sort of the client-side filtering mode
+    med_counts = med_counts.sort_values('Count', ascending=False, kind='stable')
+    return category_bar_traces(med_counts.set_index('Medication')['Count'])
+
+def diagnosis_pie_figure(cells):
+    """
+    Diagnosis Pie Chart.
+    """
+    diagnosis_counts = cells.groupby('Medical Condition', observed=True)['Count'].sum().reset_index()
+    diag_fig = px.pie(
+        diagnosis_counts,
+        names='Medical Condition',
+        values='Count',
+        title='Diagnosis Distribution',
+        hole=0.4
+    )
+    diag_fig.update_traces(textposition='outside', textinfo='percent+label')
+    return apply_chart_theme(diag_fig)
+
+def diagnosis_pie_traces(cells):
+    return pie_traces(cells, 'Medical Condition')
+
+def blood_type_treemap_figure(cells):
+    """
+    Blood Type Treemap.
+    """
+    blood_treemap_data = cells.groupby('Blood Type', observed=True)['Count'].sum().reset_index()
+    blood_treemap_fig = px.treemap(
+        blood_treemap_data,
+        path=['Blood Type'],
+        values='Count',
+        title='Blood Type Distribution',
+        color='Blood Type',
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    return apply_chart_theme(blood_treemap_fig)
+
+def blood_type_treemap_traces(cells):
+    # tiles and their colors follow the blood types, plotly express groups the path again,
+    # which keeps unobserved categories, their hover data is a placeholder
+    counts = cells.groupby('Blood Type', observed=True)['Count'].sum().reset_index()
+    counts = counts.groupby('Blood Type', observed=False)['Count'].sum()
+    return [(str(blood_type), bool(count)) for blood_type, count in counts.items()], [
+        (('data', 0, 'values'), counts.to_numpy())
+    ]
+
+def blood_type_bar_figure(cells):
+    """
+    Blood Type Stacked Bar Chart.
+    """
+    blood_type_grouped = cells.groupby(['Blood Type', 'Admission Type'], observed=True)['Count'].sum().reset_index()
+    blood_bar_chart_fig = px.bar(
+        blood_type_grouped,
+        x='Blood Type',
+        y='Count',
+        color='Admission Type',
+        title='Number of Admissions by Blood Type and Admission Type',
+        labels={'Count': 'Number of Admissions', 'Blood Type': 'Blood Type', 'Admission Type': 'Admission Type'},
+        barmode='stack'
+    )
+    return apply_chart_theme(blood_bar_chart_fig)
+
+def blood_type_bar_traces(cells):
+    blood_type_grouped = cells.groupby(['Blood Type', 'Admission Type'], observed=True)['Count'].sum().reset_index()
+    structure, updates = [], []
+    for index, (admission_type, part) in enumerate(
+        blood_type_grouped.groupby('Admission Type', observed=True, sort=False)
+    ):
+        structure.append(str(admission_type))
+        updates.append((('data', index, 'x'), part['Blood Type'].to_numpy(dtype=object)))
+        updates.append((('data', index, 'y'), part['Count'].to_numpy()))
+    return structure, updates
+
+# Outliers sent per box, spread evenly over the sorted outliers
+MAX_BOX_OUTLIERS = 50
+
+def _ranked(values, cumulative, ranks):
+    # values at the 0-based `ranks` of the sorted sample a histogram describes
+    return values[np.searchsorted(cumulative, ranks, side='right')]
+
+def box_statistics(histogram, group, value, max_outliers=MAX_BOX_OUTLIERS):
+    """
+    Quartiles and Tukey whiskers (furthest values within 1.5 IQR) of `value` per `group`, from a histogram
+    holding the number of rows of every (group, value) pair in 'Count'. Quartiles interpolate linearly
+    at rank n * q - 0.5 like the default 'linear' quartile method of plotly.js, so they are the ones `px.box`
+    computes in the browser. Returns (stats frame, outliers per group), outliers are capped to `max_outliers`
+    values per group.
+    """
+    histogram = histogram[histogram['Count'] > 0].dropna(subset=[value])
+    boxes = []
+    outliers = {}
+    for name, part in histogram.groupby(group, observed=True):
+        part = part.sort_values(value)
+        values = part[value].to_numpy()
+        counts = part['Count'].to_numpy()
+        cumulative = counts.cumsum()
+        total = cumulative[-1]
+
+        quartiles = []
+        for quantile in (0.25, 0.5, 0.75):
+            position = min(max(total * quantile - 0.5, 0), total - 1)
+            below = int(position)
+            low, high = _ranked(values, cumulative, [below, min(below + 1, total - 1)])
+            quartiles.append(low + (position - below) * (high - low))
+        q1, median, q3 = quartiles
+
+        # whiskers end at the furthest values inside the fences
+        inside = (values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))
+        boxes.append((name, q1, median, q3, values[inside].min(), values[inside].max()))
+
+        if not inside.all():
+            # outliers spread evenly over the sorted outlying rows
+            outlying = counts[~inside].cumsum()
+            ranks = np.linspace(0, outlying[-1] - 1, min(outlying[-1], max_outliers)).round().astype(int)
+            outliers[name] = _ranked(values[~inside], outlying, ranks)
+
+    stats = pd.DataFrame(boxes, columns=[group, 'q1', 'median', 'q3', 'lowerfence', 'upperfence']).set_index(group)
+    return stats, outliers
+
+def stay_box_figure(stay_histogram):
+    """
+    Length of Stay Box Plot, built from the number of admissions per condition and length of stay.
+    The figure holds a few numbers per condition instead of every stay.
+    """
+    stats, outliers = box_statistics(stay_histogram, 'Medical Condition', 'Length of Stay')
+    stay_fig = go.Figure()
+    for color, (condition, box) in zip(cycle(px.colors.qualitative.Plotly), stats.iterrows()):
+        stay_fig.add_trace(go.Box(
+            name=condition,
+            x=[condition],
+            q1=[box['q1']],
+            median=[box['median']],
+            q3=[box['q3']],
+            lowerfence=[box['lowerfence']],
+            upperfence=[box['upperfence']],
+            marker_color=color
+        ))
+        if len(outliers.get(condition, [])):
+            stay_fig.add_trace(go.Scatter(
+                x=[condition] * len(outliers[condition]),
+                y=outliers[condition],
+                mode='markers',
+                marker_color=color,
+                hovertemplate='%{y}<extra></extra>'
+            ))
+    stay_fig.update_layout(
+        title='Distribution of Length of Stay by Medical Condition',
+        xaxis_title='Medical Condition',
+        yaxis_title='Length of Stay (Days)',
+        showlegend=False
+    )
+    return apply_chart_theme(stay_fig)
+
+def stay_box_traces(stay_histogram):
+    # a box per condition, followed by its outliers when it has any
+    stats, outliers = box_statistics(stay_histogram, 'Medical Condition', 'Length of Stay')
+    structure, updates = [], []
+    index = 0
+    for condition, box in stats.iterrows():
+        condition_outliers = outliers.get(condition, [])
+        structure.append((str(condition), bool(len(condition_outliers))))
+        for statistic in ('q1', 'median', 'q3', 'lowerfence', 'upperfence'):
+            updates.append((('data', index, statistic), [box[statistic]]))
+        index += 1
+        if len(condition_outliers):
+            updates.append((('data', index, 'x'), [condition] * len(condition_outliers)))
+            updates.append((('data', index, 'y'), condition_outliers))
+            index += 1
+    return structure, updates
+
+def diagnosis_medication_pivot(cells):
+    return cells.pivot_table(
+        index='Medical Condition',
+        columns='Medication',
+        values='Count',
+        aggfunc='sum',
+        fill_value=0,
+        observed=True
+    )
+
+def diagnosis_medication_heatmap_figure(cells):
+    """
+    Diagnosis vs Medication Heatmap.
+    """
+    heatmap_fig = px.imshow(
+        diagnosis_medication_pivot(cells),
+        labels=dict(x="Medication", y="Medical Condition", color="Number of Patients"),
+        title='Diagnosis vs Medication Heatmap'
+    )
+    return apply_chart_theme(heatmap_fig)
+
+def diagnosis_medication_heatmap_traces(cells):
+    diag_med_pivot = diagnosis_medication_pivot(cells)
+    return [diag_med_pivot.empty], [
+        (('data', 0, 'x'), diag_med_pivot.columns.to_numpy(dtype=object)),
+        (('data', 0, 'y'), diag_med_pivot.index.to_numpy(dtype=object)),
+        (('data', 0, 'z'), diag_med_pivot.to_numpy())
+    ]
+
+# Builder and traces function of every graph id, with the input they take:
+# 'cells' of the cube, the length of stay 'histogram' or the filtered time 'series' with its level
+FIGURE_BUILDERS = {
+    'billing-graph': ('series', billing_figure, billing_traces),
+    'admission-pie-chart': ('cells', admission_pie_figure, admission_pie_traces),
+    'admission-bar-chart': ('cells', admission_bar_figure, admission_bar_traces),
+    'stay-line-chart': ('histogram', stay_box_figure, stay_box_traces),
+    'medication-bar-chart': ('cells', medication_bar_figure, medication_bar_traces),
+    'diagnosis-pie-chart': ('cells', diagnosis_pie_figure, diagnosis_pie_traces),
+    'blood-type-treemap': ('cells', blood_type_treemap_figure, blood_type_treemap_traces),
+    'blood-type-bar-chart': ('cells', blood_type_bar_figure, blood_type_bar_traces),
+    'diagnosis-medication-heatmap': ('cells', diagnosis_medication_heatmap_figure, diagnosis_medication_heatmap_traces),
+}
+
+_skeletons = OrderedDict()
+_skeletons_lock = threading.Lock()
+
+def skeleton(graph_id, structure, build):
+    """
+    Figure dict of `graph_id` for the trace `structure`, `build()` makes it with plotly express on first use.
+    Do not modify the result.
+    """
+    key = (graph_id, structure)
+    with _skeletons_lock:
+        figure = _skeletons.get(key)
+        if figure is not None:
+            _skeletons.move_to_end(key)
+            return figure
+    figure = build().to_dict()
+    with _skeletons_lock:
+        _skeletons[key] = figure
+        while len(_skeletons) > MAX_SKELETONS:
+            _skeletons.popitem(last=False)
+    return figure
+
+def with_value(node, path, value):
+    """
+    Copy of the figure dict `node` with `value` at `path`, only the containers along the path are copied.
+    """
+    if not path:
+        return value
+    copy = list(node) if isinstance(node, list) else dict(node)
+    copy[path[0]] = with_value(node[path[0]], path[1:], value)
+    return copy
+
+def structure_token(graph_id, structure):
+    return hashlib.sha1(repr((graph_id, structure)).encode('utf-8')).hexdigest()[:16]
+
+def build_figure(graph_id, *figure_data):
+    """
+    Figure of `graph_id` from its input (see `FIGURE_BUILDERS`), as a `FigureUpdate`.
+    """
+    _, builder, traces = FIGURE_BUILDERS[graph_id]
+    structure, updates = traces(*figure_data)
+    structure = tuple(structure)
+    figure = skeleton(graph_id, structure, lambda: builder(*figure_data))
+    for path, value in updates:
+        figure = with_value(figure, path, value)
+    return FigureUpdate(structure_token(graph_id, structure), figure, updates)
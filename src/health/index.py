@@ -0,0 +1,107 @@
+"""
+Columnar filter index over `data`, built once at load time so the callbacks resolve
+the filter state to row positions with set operations instead of scanning every row.
+"""
+import numpy as np
+import pandas as pd
+
+class FilterIndex:
+    """
+    Index for the dashboard filters:
+    categorical codes with per-category row bitmaps for 'Medical Condition' and 'Gender',
+    rows sorted by 'Date of Admission' and 'Age' for binary-search range lookups.
+    Bitmaps are packed (8 rows per byte), so unions and intersections touch n / 8 bytes.
+    """
+
+    def __init__(self, data):
+        self.size = len(data)
+
+        self.condition_codes, self.conditions, self.condition_bitmaps = self._build_categorical(data['Medical Condition'])
+        self.gender_codes, self.genders, self.gender_bitmaps = self._build_categorical(data['Gender'])
+        # rows without a category match no selection, so selecting every category only matches all rows without them
+        self.conditions_missing = bool((self.condition_codes < 0).any())
+        self.genders_missing = bool((self.gender_codes < 0).any())
+
+        dates = data['Date of Admission'].to_numpy(dtype='datetime64[ns]')
+        self.date_order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.date_order]
+
+        ages = data['Age'].to_numpy(dtype='float64')
+        self.age_order = np.argsort(ages, kind='stable')
+        self.sorted_ages = ages[self.age_order]
+
+    def _build_categorical(self, column):
+        """
+        Returns the codes, the categories and one packed row bitmap per category.
+        """
+        codes, categories = pd.factorize(column, sort=True)
+        bitmaps = {
+            category: np.packbits(codes == code)
+            for code, category in enumerate(categories)
+        }
+        return codes, list(categories), bitmaps
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the codes, sorted columns and bitmaps of the index.
+        """
+        total = 0
+        for value in vars(self).values():
+            arrays = value.values() if isinstance(value, dict) else [value]
+            total += sum(array.nbytes for array in arrays if isinstance(array, np.ndarray))
+        return total
+
+    def _union(self, bitmaps, missing, selected):
+        """
+        Bitmap of rows whose category is in `selected`, None when every row matches.
+        `missing` tells whether some rows have no category.
+        """
+        selected = set(selected)
+        if not missing and selected.issuperset(bitmaps):
+            return None
+
+        bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for category in selected:
+            if category in bitmaps:
+                np.bitwise_or(bits, bitmaps[category], out=bits)
+        return bits
+
+    def _range(self, order, sorted_values, low, high):
+        """
+        Bitmap of rows with `low <= value <= high`, None when every row matches.
+        A bound of None leaves that side open.
+        """
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        stop = self.size if high is None else np.searchsorted(sorted_values, high, side='right')
+        if start == 0 and stop == self.size:
+            return None
+
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:stop]] = True
+        return np.packbits(mask)
+
+    def select(self, selected_conditions, selected_age, selected_genders, start_date, end_date):
+        """
+        Returns sorted row positions matching the filter state,
+        the same rows the `isin` and range masks in the callbacks would keep.
+        """
+        if start_date is not None:
+            start_date = np.datetime64(pd.Timestamp(start_date), 'ns')
+        if end_date is not None:
+            end_date = np.datetime64(pd.Timestamp(end_date), 'ns')
+
+        bitmaps = [
+            self._union(self.condition_bitmaps, self.conditions_missing, selected_conditions),
+            self._union(self.gender_bitmaps, self.genders_missing, selected_genders),
+            self._range(self.age_order, self.sorted_ages, selected_age[0], selected_age[1]),
+            self._range(self.date_order, self.sorted_dates, start_date, end_date)
+        ]
+        bitmaps = [bits for bits in bitmaps if bits is not None]
+        if not bitmaps:
+            return np.arange(self.size)
+
+        bits = bitmaps[0].copy()
+        for other in bitmaps[1:]:
+            np.bitwise_and(bits, other, out=bits)
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
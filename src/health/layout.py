@@ -1,13 +1,108 @@
 """
 GUI setup for placements of visuals.
 """
+from functools import lru_cache
+
 from dash import dcc, html
 import dash_table
 
-def create_layout(data):
+from .client import CLIENT_FILTERING
+from .timing import startup_phase
+
+# Graphs placed on each tab, keyed by the `dcc.Tab` value.
+# Callbacks only compute figures of the active tab.
+TAB_FIGURES = {
+    'overview': [
+        'admission-pie-chart',
+        'admission-bar-chart',
+        'billing-graph',
+        'stay-line-chart',
+    ],
+    'medical': [
+        'blood-type-treemap',
+        'blood-type-bar-chart',
+        'diagnosis-medication-heatmap',
+        'medication-bar-chart',
+        'diagnosis-pie-chart',
+    ],
+}
+
+# Graphs depending on more than the filters, with the store holding their view settings
+FIGURE_VIEWS = {
+    'billing-graph': 'series-view',
+}
+
+# How often open dashboards check for new data, see `sources.DataSource.reload`
+REFRESH_INTERVAL_MS = 30_000
+
+def condition_options(bounds):
+    return [{'label': cond, 'value': cond} for cond in bounds.conditions]
+
+def gender_options(bounds):
+    return [{'label': gender, 'value': gender} for gender in bounds.genders]
+
+def age_marks(bounds):
+    return {str(age): str(age) for age in range(bounds.min_age, bounds.max_age + 1, 10)}
+
+def data_version(bounds):
+    """
+    Content of the 'data-version' store, the version the page shows and the last admission date.
+    """
+    return {'version': bounds.version, 'end_date': bounds.end_date.strftime('%Y-%m-%d')}
+
+def create_loading_layout():
+    """
+    Layout shell served while the dataset is still loading.
+    The 'loading-interval' polls until the callbacks swap 'page-content' for the dashboard.
+    """
+    return html.Div(
+        style={'backgroundColor': '#f9f9f9', 'font-family': 'Arial'},
+        children=[
+            dcc.Interval(id='loading-interval', interval=500),
+            html.Div(id='page-content', children=[
+                html.H1(
+                    children='Hospital Admissions Dashboard',
+                    style={'textAlign': 'center', 'color': '#333'}
+                ),
+                html.Div(
+                    children='Loading admissions data...',
+                    style={'textAlign': 'center', 'color': '#777'}
+                ),
+            ]),
+        ]
+    )
+
+def create_tenant_index(names):
+    """
+    Page listing the dashboards of the tenants `names`, served on `/` when serving several tenants.
+    """
+    return html.Div(
+        style={'backgroundColor': '#f9f9f9', 'font-family': 'Arial'},
+        children=[
+            html.H1(
+                children='Hospital Admissions Dashboard',
+                style={'textAlign': 'center', 'color': '#333'}
+            ),
+            html.Ul(
+                children=[html.Li(html.A(name, href=f'/{name}')) for name in names],
+                style={'width': 'fit-content', 'margin': 'auto', 'color': '#333'}
+            ),
+        ]
+    )
+
+# one layout per data source serving pages
+@lru_cache(maxsize=32)
+def build_layout(bounds):
+    """
+    Dashboard layout for the `sources.Bounds` of the data, built once and reused for every page load.
+    """
+    with startup_phase('layout build'):
+        return create_layout(bounds)
+
+def create_layout(bounds):
     """
     Builds and returns the Dash layout (all the HTML/Dash components).
-    This function requires the 'data' DataFrame to extract default filter values.
+    This function requires the `bounds` of the data source to extract default filter values.
     """
 
     # Reusable card style
@@ -43,11 +138,8 @@ def create_layout(data):
                         ),
                         dcc.Dropdown(
                             id='condition-dropdown',
-                            options=[
-                                {'label': cond, 'value': cond}
-                                for cond in sorted(data['Medical Condition'].unique())
-                            ],
-                            value=data['Medical Condition'].unique().tolist(),
+                            options=condition_options(bounds),
+                            value=list(bounds.conditions),
                             multi=True
                         ),
                     ], style={
@@ -69,11 +161,8 @@ def create_layout(data):
                         html.Div([
                             dcc.Checklist(
                                 id='gender-checklist',
-                                options=[
-                                    {'label': gender, 'value': gender}
-                                    for gender in data['Gender'].unique()
-                                ],
-                                value=data['Gender'].unique().tolist(),
+                                options=gender_options(bounds),
+                                value=list(bounds.genders),
                                 labelStyle={
                                     'display': 'inline-block',
                                     'padding': '5px 10px',
@@ -104,17 +193,10 @@ def create_layout(data):
                         ),
                         dcc.RangeSlider(
                             id='age-slider',
-                            min=int(data['Age'].min()),
-                            max=int(data['Age'].max()),
-                            value=[int(data['Age'].min()), int(data['Age'].max())],
-                            marks={
-                                str(age): str(age)
-                                for age in range(
-                                    int(data['Age'].min()),
-                                    int(data['Age'].max()) + 1,
-                                    10
-                                )
-                            },
+                            min=bounds.min_age,
+                            max=bounds.max_age,
+                            value=[bounds.min_age, bounds.max_age],
+                            marks=age_marks(bounds),
                             step=1
                         ),
                     ], style={
@@ -135,9 +217,11 @@ def create_layout(data):
                         ),
                         dcc.DatePickerRange(
                             id='date-picker',
-                            start_date=data['Date of Admission'].min(),
-                            end_date=data['Date of Admission'].max(),
-                            display_format='YYYY-MM-DD'
+                            start_date=bounds.start_date,
+                            end_date=bounds.end_date,
+                            display_format='YYYY-MM-DD',
+                            # committed once both dates are picked
+                            updatemode='bothdates'
                         ),
                     ], style={
                         'width': '30%',
@@ -160,9 +244,29 @@ def create_layout(data):
                 }),
             ]),
 
+            # Normalized filter state shared by all callbacks, and the filter state
+            # each output was last rendered for, so unchanged outputs are skipped
+            dcc.Store(id='filter-state'),
+            # Data version the page shows, polled so new admissions reach open dashboards
+            dcc.Store(id='data-version', data=data_version(bounds)),
+            dcc.Interval(id='refresh-interval', interval=REFRESH_INTERVAL_MS),
+            # Client-side filtering mode (see `client`): the cube, and the filter state each side answers
+            html.Div([
+                dcc.Store(id='client-cube'),
+                dcc.Store(id='client-filter-state'),
+                dcc.Store(id='server-filter-state'),
+            ] if CLIENT_FILTERING else []),
+            dcc.Store(id='summary-rendered'),
+            dcc.Store(id='series-view'),
+            html.Div([
+                dcc.Store(id=f'{graph_id}-rendered')
+                for graph_ids in TAB_FIGURES.values()
+                for graph_id in graph_ids
+            ]),
+
             # Tabs
-            dcc.Tabs([
-                dcc.Tab(label='Healthcare Overview', children=[
+            dcc.Tabs(id='tabs', value='overview', children=[
+                dcc.Tab(label='Healthcare Overview', value='overview', children=[
                     # Summary Cards
                     html.Div([
                         html.Div([
@@ -193,6 +297,21 @@ def create_layout(data):
                             dcc.Graph(id='admission-bar-chart', style={'width': '48%', 'display': 'inline-block'}),
                         ], style={'display': 'flex', 'justifyContent': 'space-between'}),
 
+                        html.Div([
+                            html.Label('Time Resolution:', style={'fontWeight': 'bold', 'marginRight': '10px'}),
+                            dcc.RadioItems(
+                                id='time-resolution',
+                                options=[
+                                    {'label': 'Auto', 'value': 'auto'},
+                                    {'label': 'Day', 'value': 'day'},
+                                    {'label': 'Week', 'value': 'week'},
+                                    {'label': 'Month', 'value': 'month'},
+                                    {'label': 'Quarter', 'value': 'quarter'}
+                                ],
+                                value='auto',
+                                inline=True
+                            ),
+                        ], style={'display': 'flex', 'alignItems': 'center', 'padding': '10px'}),
                         dcc.Graph(id='billing-graph'),
                         dcc.Graph(id='stay-line-chart'),
                     ]),
@@ -201,17 +320,24 @@ def create_layout(data):
                     html.Div([
                         dash_table.DataTable(
                             id='data-table',
-                            columns=[{"name": i, "id": i} for i in data.columns],
+                            columns=[{"name": i, "id": i} for i in bounds.columns],
+                            page_current=0,
                             page_size=10,
                             style_table={'overflowX': 'auto'},
                             style_cell={'textAlign': 'left'},
-                            sort_action="native",
-                            filter_action="native"
+                            # Paging, sorting and filtering are answered by the server,
+                            # only the visible page is sent to the browser
+                            page_action="custom",
+                            sort_action="custom",
+                            sort_mode="single",
+                            sort_by=[],
+                            filter_action="custom",
+                            filter_query=''
                         )
                     ], style={'padding': '0 20'}),
                 ]),
 
-                dcc.Tab(label='Medical Details', children=[
+                dcc.Tab(label='Medical Details', value='medical', children=[
                     # Medical Charts
                     html.Div([
                         html.Div([
@@ -0,0 +1,275 @@
+"""
+Request instrumentation, exported in the Prometheus text format on the `/metrics` route of the server.
+Every stage between a callback request and its response (filtering, cube cells, each figure build,
+the chart theme, serialization, table records) is timed with `stage`, payload sizes are kept per figure
+and per callback, the startup phases of `timing` are exported as gauges, and so are the result cache counters.
+
+Configured with environment variables:
+`HEALTH_PROFILE_THRESHOLD_MS` profiles callback requests with cProfile, one at a time, and dumps the profile
+of the ones slower than the threshold to `HEALTH_PROFILE_DIR` (`profiles` by default), profiling is off when unset.
+"""
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from .timing import STARTUP_TIMINGS
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+CALLBACK_PATH = '/_dash-update-component'
+# one cProfile profiler can be active at a time (a second one raises ValueError on Python 3.12 and newer),
+# callback requests arriving while another one is profiled are only timed
+_profiler_lock = threading.Lock()
+
+class Histogram:
+    """
+    Bucket counts, sum and count of the observed values of every label set, safe to use from several threads.
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # sorted label items -> [count per bucket (last one +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def exposition(self):
+        """
+        Lines of the histogram in the Prometheus text format.
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(key + (("le", bound),))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(key)} {cumulative}')
+        return lines
+
+def format_labels(items):
+    """
+    `{name="value",...}` of the (name, value) label items, values escaped as the text format requires.
+    """
+    if not items:
+        return ''
+    return '{' + ','.join(
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in items
+    ) + '}'
+
+STAGE_SECONDS = Histogram(
+    'health_stage_seconds', 'Duration of the stages of a dashboard update.', SECONDS_BUCKETS
+)
+CALLBACK_SECONDS = Histogram(
+    'health_callback_seconds', 'Duration of callback requests by first output and status.', SECONDS_BUCKETS
+)
+CALLBACK_BYTES = Histogram(
+    'health_callback_response_bytes', 'Size of callback responses as sent, by first output and content encoding.',
+    BYTES_BUCKETS
+)
+FIGURE_BYTES = Histogram(
+    'health_figure_bytes', 'Size of serialized figures.', BYTES_BUCKETS
+)
+HISTOGRAMS = [STAGE_SECONDS, CALLBACK_SECONDS, CALLBACK_BYTES, FIGURE_BYTES]
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Times the enclosed block as the stage `name` of a dashboard update.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, **labels)
+
+def observe_stage(name, seconds, **labels):
+    """
+    Records a stage timed elsewhere (e.g. on a worker process).
+    """
+    STAGE_SECONDS.observe(seconds, stage=name, **labels)
+
+def render_metrics():
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = [
+        '# HELP health_startup_seconds Duration of the last run of every startup phase.',
+        '# TYPE health_startup_seconds gauge',
+    ]
+    for phase, seconds in list(STARTUP_TIMINGS.items()):
+        lines.append(f'health_startup_seconds{format_labels((("phase", phase),))} {seconds}')
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.exposition())
+    lines.extend(cache_metrics())
+    lines.extend(tenant_metrics())
+    return '\n'.join(lines) + '\n'
+
+# name, type, help and `ResultCache.stats()` key of the result cache metrics
+CACHE_METRICS = [
+    ('health_cache_hits_total', 'counter', 'Result cache lookups answered from the cache.', 'hits'),
+    ('health_cache_misses_total', 'counter', 'Result cache lookups that computed the result.', 'misses'),
+    ('health_cache_evictions_total', 'counter', 'Result cache entries evicted or expired.', 'evictions'),
+    ('health_cache_entries', 'gauge', 'Entries held by the result cache.', 'entries'),
+]
+
+def cache_metrics():
+    """
+    Counters and size of the result cache, per tenant when serving several datasets.
+    Counters are kept per process, entries of the disk backend are the ones shared by all processes.
+    """
+    # imported here, tenants imports this module through sources
+    from .tenants import registry, source
+
+    if registry is None:
+        caches = [((), source.cache.stats())]
+    else:
+        caches = [((('tenant', tenant),), stats) for tenant, stats in registry.cache_stats().items()]
+    lines = []
+    for name, kind, documentation, key in CACHE_METRICS:
+        lines.extend([f'# HELP {name} {documentation}', f'# TYPE {name} {kind}'])
+        for labels, stats in caches:
+            lines.append(f'{name}{format_labels(labels)} {stats[key]}')
+    return lines
+
+def tenant_metrics():
+    """
+    Memory gauges of every tenant, nothing when serving a single dataset.
+    """
+    # imported here, tenants imports this module through sources
+    from .tenants import registry
+
+    if registry is None:
+        return []
+    lines = [
+        '# HELP health_tenant_memory_bytes Memory of the loaded dataset of every tenant, private to this process '
+        'or memory-mapped and shared.',
+        '# TYPE health_tenant_memory_bytes gauge',
+    ]
+    report = registry.memory_report()
+    for tenant, usage in report.items():
+        lines.append(f'health_tenant_memory_bytes{format_labels((("tenant", tenant), ("kind", "private")))} '
+                     f'{usage["private_bytes"]}')
+        lines.append(f'health_tenant_memory_bytes{format_labels((("tenant", tenant), ("kind", "mapped")))} '
+                     f'{usage["mapped_bytes"]}')
+    lines.extend([
+        '# HELP health_tenant_loaded Whether the dataset of every tenant is loaded in this process.',
+        '# TYPE health_tenant_loaded gauge',
+    ])
+    for tenant, usage in report.items():
+        lines.append(f'health_tenant_loaded{format_labels((("tenant", tenant),))} {int(usage["loaded"])}')
+    lines.extend([
+        '# HELP health_tenant_unloads_total Datasets unloaded to stay within the tenant limits.',
+        '# TYPE health_tenant_unloads_total counter',
+        f'health_tenant_unloads_total {registry.unloads}',
+    ])
+    return lines
+
+def callback_output(body, callback_map):
+    """
+    Id of the first output of a callback request, the label of its metrics.
+    Requests for outputs without a callback in `callback_map` (the app's) are labelled 'unknown',
+    so clients can't create label series at will.
+    """
+    if (body or {}).get('output') not in callback_map:
+        return 'unknown'
+    outputs = body.get('outputs')
+    if isinstance(outputs, list):
+        outputs = outputs[0] if outputs else {}
+    output_id = (outputs or {}).get('id', 'unknown')
+    # pattern matching ids are dicts
+    return output_id if isinstance(output_id, str) else 'pattern'
+
+def profile_threshold():
+    threshold = os.environ.get('HEALTH_PROFILE_THRESHOLD_MS')
+    return float(threshold) / 1000 if threshold else None
+
+def register_metrics(server, callback_map):
+    """
+    Adds the `/metrics` route to the Flask `server` and times (and optionally profiles) every callback request.
+    `callback_map` is the Dash app's, callbacks registered later are picked up.
+    """
+    from flask import Response, g, request
+
+    threshold = profile_threshold()
+    profile_dir = os.environ.get('HEALTH_PROFILE_DIR', 'profiles')
+
+    @server.before_request
+    def start_timer():
+        if request.path != CALLBACK_PATH:
+            return
+        g.health_start = time.perf_counter()
+        if threshold is not None and _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # a profiler not started here is active
+                _profiler_lock.release()
+            else:
+                g.health_profiler = profiler
+
+    def stop_profiler():
+        profiler = g.pop('health_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        return profiler
+
+    def record_request(response):
+        start = g.pop('health_start', None)
+        if start is None:
+            return response
+        profiler = stop_profiler()
+        seconds = time.perf_counter() - start
+        output = callback_output(request.get_json(silent=True), callback_map)
+        CALLBACK_SECONDS.observe(seconds, output=output, status=response.status_code)
+        if response.content_length is not None:
+            CALLBACK_BYTES.observe(
+                response.content_length, output=output, encoding=response.content_encoding or 'identity'
+            )
+
+        if profiler is not None and seconds > threshold:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = re.sub(r'[^\w.-]', '_', output)
+            path = os.path.join(profile_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{seconds * 1000:.0f}ms.prof')
+            profiler.dump_stats(path)
+            logger.warning('Callback %s took %.0f ms, profile written to %s', output, seconds * 1000, path)
+        return response
+
+    # after-request functions run in reverse order of registration, first in the list means after flask-compress
+    # (registered by Dash), so the time includes compression and sizes are the ones sent
+    server.after_request_funcs.setdefault(None, []).insert(0, record_request)
+
+    @server.teardown_request
+    def release_profiler(exception):
+        # however the request ended, the profiler lock is not left held
+        stop_profiler()
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
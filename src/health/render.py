@@ -0,0 +1,148 @@
+"""
+Concurrent figure rendering. When the first figure of a tab is requested, every figure of that tab
+is submitted to a pool, so one interaction keeps all cores busy instead of building figures one by one.
+
+Configured with environment variables:
+`HEALTH_RENDER_POOL` (`none` builds on the request thread, `thread` or `process`)
+and `HEALTH_RENDER_WORKERS` (pool size, the number of CPUs by default).
+Threads share the cached filtered frame of the process. Worker processes share the dataset pages
+(forked after loading, or memory-mapped columnar data) and resolve the selection with the filter index,
+or query the database with a connection pool of their own. Serving several tenants (see `tenants`),
+workers load the datasets of the tenants they build figures for.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .encoding import payload_encoding, to_json
+from .metrics import FIGURE_BYTES, observe_stage, stage
+
+logger = logging.getLogger(__name__)
+
+# Encoding of the figure payloads, see `encoding`
+PAYLOAD_ENCODING = payload_encoding()
+
+# Submitted figures remembered so concurrent callbacks of one tab wait for the same build
+MAX_PENDING = 64
+
+# Serialized figure: the token of its trace structure, the whole figure and the updates of its data arrays
+RenderedFigure = namedtuple('RenderedFigure', ['structure', 'figure_json', 'updates_json'])
+
+# Set in worker processes, their data sources don't see the reloads of the server process
+_in_worker = False
+
+def build_figure_json(graph_id, filter_state, view=None, tenant=None):
+    """
+    Builds one figure from the data of `tenant` (the single data source for None) and serializes it.
+    Returns (`RenderedFigure`, seconds spent). Runs on the pool, so it only takes picklable arguments.
+    """
+    # imported here, callbacks imports this module
+    from .callbacks import render_figure
+    from .tenants import tenant_source
+
+    start = time.perf_counter()
+    data_source = tenant_source(tenant)
+    if _in_worker and data_source.ready and filter_state['version'] != data_source.version:
+        # the server reloaded, pick up the same data before building for its version
+        data_source.reload()
+    figure = render_figure(graph_id, filter_state, view, data_source)
+    with stage('figure serialize', figure=graph_id):
+        rendered = RenderedFigure(
+            figure.structure,
+            to_json(figure.figure, PAYLOAD_ENCODING),
+            to_json([[list(path), value] for path, value in figure.updates], PAYLOAD_ENCODING)
+        )
+    return rendered, time.perf_counter() - start
+
+def _init_worker():
+    global _in_worker
+    from .sources import source
+    from .tenants import registry
+
+    _in_worker = True
+    # tenants' datasets are loaded by their first figure
+    if registry is None:
+        source.load()
+
+class FigureRenderer:
+    """
+    Builds figures inline or on a thread or process pool, keeping the last build time of every figure.
+    """
+
+    def __init__(self, mode='none', workers=None):
+        if mode not in ('none', 'thread', 'process'):
+            raise ValueError(f"Unknown HEALTH_RENDER_POOL '{mode}', use 'none', 'thread' or 'process'")
+        self.mode = mode
+        self.workers = workers or os.cpu_count()
+        self.timings = {}
+        self._executor = None
+        self._pending = OrderedDict()
+        # reentrant, the callback of a future that is already done runs while submitting
+        self._lock = threading.RLock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == 'thread':
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='figure')
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    def _record(self, graph_id, seconds, rendered):
+        # stages inside the build are only recorded by the process that ran it,
+        # the whole build and the payload are always recorded here
+        self.timings[graph_id] = seconds
+        observe_stage('figure render', seconds, figure=graph_id)
+        FIGURE_BYTES.observe(len(rendered.figure_json), figure=graph_id)
+        logger.debug('Figure %s built in %.1f ms', graph_id, seconds * 1000)
+
+    def _submit(self, pending_key, executor, *args):
+        # a failed build is forgotten, the next request for it builds it again instead of re-raising
+        future = self._pending[pending_key] = executor.submit(build_figure_json, *args)
+        future.add_done_callback(lambda done: self._forget_failed(pending_key, done))
+        return future
+
+    def _forget_failed(self, pending_key, future):
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                if self._pending.get(pending_key) is future:
+                    del self._pending[pending_key]
+
+    def render(self, graph_id, filter_state, key, siblings=(), view=None, tenant=None):
+        """
+        Returns the `RenderedFigure` of `graph_id` for the filter state (and `view`) with key `key`,
+        from the data of `tenant`. On a pool, `siblings` (the other figures of the tab) are submitted along with it.
+        """
+        if self.mode == 'none':
+            rendered, seconds = build_figure_json(graph_id, filter_state, view, tenant)
+            self._record(graph_id, seconds, rendered)
+            return rendered
+
+        with self._lock:
+            executor = self._get_executor()
+            future = self._pending.get((tenant, graph_id, key))
+            if future is None:
+                future = self._submit((tenant, graph_id, key), executor, graph_id, filter_state, view, tenant)
+            for figure_id in siblings:
+                if (tenant, figure_id, key) not in self._pending:
+                    self._submit((tenant, figure_id, key), executor, figure_id, filter_state, None, tenant)
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+
+        rendered, seconds = future.result()
+        self._record(graph_id, seconds, rendered)
+        return rendered
+
+    def figure_timings(self):
+        """
+        Seconds the last build of every figure took.
+        """
+        return dict(self.timings)
+
+renderer = FigureRenderer(
+    os.environ.get('HEALTH_RENDER_POOL', 'none'),
+    int(os.environ.get('HEALTH_RENDER_WORKERS', 0)) or None
+)
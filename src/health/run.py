@@ -2,9 +2,36 @@
 """
 Basic entry/setup point with `main` fucntion.
 """
+import logging
+import threading
+
+from .timing import startup_phase
+
+def warm_up():
+    """
+    Loads the data source and the figure modules in the background, the layout shell is served meanwhile.
+    Tenants' datasets are loaded by their first page instead.
+    """
+    from .sources import RELOAD_INTERVAL, source
+    from .tenants import registry
+
+    if registry is None:
+        source.load()
+        if RELOAD_INTERVAL:
+            source.watch(RELOAD_INTERVAL)
+    elif RELOAD_INTERVAL:
+        registry.watch(RELOAD_INTERVAL)
+    with startup_phase('figure imports'):
+        from . import figures  # noqa: F401
+
 def main():
-    from .app import app
-    from .callbacks import register_callbacks
+    logging.basicConfig(level=logging.INFO)
+
+    with startup_phase('imports'):
+        from .app import app
+        from .callbacks import register_callbacks
+
+    threading.Thread(target=warm_up, name='dataset-loader', daemon=True).start()
 
     register_callbacks(app)    
     app.run_server(debug=True)
@@ -0,0 +1,652 @@
+"""
+Data sources behind the callbacks, which only ever ask for aggregates and the visible table page.
+`FrameSource` answers from the dataset held in memory (the CSV or its columnar copy),
+`SqliteSource` pushes the filters down as parameterized GROUP BY queries over pooled connections.
+
+Selected with environment variables:
+`HEALTH_DATA_SOURCE` (`csv` or `sqlite`), `HEALTH_SQLITE_PATH` (database written by `dashboard-ingest --sqlite`,
+data/hospital_data.sqlite by default) and `HEALTH_SQLITE_POOL` (open connections, 4 by default).
+`HEALTH_RELOAD_INTERVAL` (seconds, off by default) makes `watch` pick up new admissions.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from .cache import result_cache
+from .cube import CUBE_MEASURES, build_cells
+from .data import DATE_COLUMNS, DEFAULT_CHART_WIDTH, TimeSeriesStore, default_csv_path, provider
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# DataTable filter syntax operators, longest prefixes first
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith ']
+]
+
+# Values the layout takes from the data: filter options, slider and date picker bounds, table columns,
+# and the data version they were read from
+Bounds = namedtuple(
+    'Bounds',
+    ['conditions', 'genders', 'min_age', 'max_age', 'start_date', 'end_date', 'columns', 'version']
+)
+
+# Dimensions of the cells shipped to the browser in the client-side filtering mode, see `client`
+CLIENT_DIMENSIONS = ['Medical Condition', 'Gender', 'Age', 'Admission Type', 'Blood Type', 'Medication']
+
+def frame_bounds(data, version=None):
+    """
+    `Bounds` of a loaded data frame.
+    """
+    return Bounds(
+        conditions=tuple(sorted(data['Medical Condition'].dropna().unique())),
+        genders=tuple(data['Gender'].dropna().unique()),
+        min_age=int(data['Age'].min()),
+        max_age=int(data['Age'].max()),
+        start_date=data['Date of Admission'].min(),
+        end_date=data['Date of Admission'].max(),
+        columns=tuple(data.columns),
+        version=version
+    )
+
+def filter_state_key(filter_state):
+    """
+    Hashable key of a normalized filter state.
+    """
+    return json.dumps(filter_state, sort_keys=True)
+
+def split_filter_part(filter_part):
+    """
+    Splits one `filter_query` part such as `{Age} ge 30` into (column, operator, value).
+    The value is the text as written, unquoted, see `convert_filter_value` for its conversion.
+    Returns (None, None, None) for parts it does not understand.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+def convert_filter_value(value, operator, kind):
+    """
+    Value of a table filter part in the type of its column, `kind` being 'datetime', 'numeric' or 'text'.
+    `contains` and `datestartswith` match the text of the values, their value stays the text written.
+    Returns None when the value doesn't convert, the callers skip such parts.
+    """
+    if operator in ('contains', 'datestartswith') or kind == 'text':
+        return value
+    if kind == 'datetime':
+        value = pd.to_datetime(value, errors='coerce')
+        return None if pd.isna(value) else value
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    if not math.isfinite(number):
+        return None
+    return int(number) if number.is_integer() else number
+
+def column_kind(column):
+    """
+    Kind of a frame column for `convert_filter_value`.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return 'numeric'
+    return 'text'
+
+def apply_table_query(frame, sort_by, filter_query):
+    """
+    Applies the DataTable `filter_query` and `sort_by` properties to `frame`.
+    Filter parts on unknown columns, or with values that don't convert to the column's type, are skipped.
+    """
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in frame.columns:
+            continue
+        column = frame[col_name]
+        filter_value = convert_filter_value(value, operator, column_kind(column))
+        if filter_value is None:
+            continue
+        if isinstance(column.dtype, pd.CategoricalDtype) and operator in ('lt', 'le', 'gt', 'ge'):
+            # unordered categoricals can't be compared, their values can
+            column = column.astype(str)
+
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            # these operators match pandas series operator method names
+            frame = frame.loc[getattr(column, operator)(filter_value)]
+        elif operator == 'contains':
+            frame = frame.loc[column.astype(str).str.contains(str(filter_value), regex=False)]
+        elif operator == 'datestartswith':
+            frame = frame.loc[column.astype(str).str.startswith(str(filter_value))]
+
+    if sort_by:
+        frame = frame.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            inplace=False
+        )
+
+    return frame
+
+def page_count_of(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+def page_records(page):
+    with stage('table records'):
+        return page.to_dict('records')
+
+class DataSource:
+    """
+    What the callbacks read, every method takes a normalized filter state (see `callbacks.normalize_filter_state`).
+    Subclasses implement `ready`, `version`, `load`, `refresh`, `bounds`, `time_series_store`,
+    `_compute_cells`, `client_cells`, `stay_histogram` and `table_page`.
+    `cache` is the result cache of the callbacks reading this source, `cache.result_cache` unless given.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or result_cache
+        # every chart of a tab reads the cells of the same filter state
+        self._cells = lru_cache(maxsize=8)(self._timed_cells)
+
+    def clear_caches(self):
+        self._cells.cache_clear()
+
+    def reload(self):
+        """
+        Picks up new data, returns True when it changed. Cached results are dropped then,
+        results still being computed for the old version are keyed by its filter states (which hold
+        the version), so they are never served for the new one.
+        """
+        with stage('reload'):
+            changed = self.refresh()
+        if not changed:
+            return False
+        self.clear_caches()
+        self.cache.clear()
+        return True
+
+    def watch(self, interval):
+        """
+        Calls `reload` every `interval` seconds on a daemon thread.
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception:
+                    logger.exception('Reloading the data source failed')
+
+        thread = threading.Thread(target=run, name='data-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def _timed_cells(self, key):
+        with stage('cells'):
+            return self._compute_cells(key)
+
+    def cells(self, filter_state):
+        """
+        Cells as built by `cube.build_cells` (possibly over fewer dimensions) for the filter state.
+        Do not modify the result.
+        """
+        return self._cells(filter_state_key(filter_state))
+
+    def time_series(self, filter_state, series_view=None):
+        """
+        Returns (series, level), the admission counts for the selected conditions and dates
+        at the level fitting `series_view` ({'resolution', 'width'} of the chart), see `TimeSeriesStore.query`.
+        """
+        series_view = series_view or {}
+        return self.time_series_store().query(
+            filter_state['conditions'],
+            filter_state['start_date'],
+            filter_state['end_date'],
+            series_view.get('resolution') or 'auto',
+            series_view.get('width') or DEFAULT_CHART_WIDTH
+        )
+
+class FrameSource(DataSource):
+    """
+    Source over the `Dataset` of a `DataProvider`, filtered with its filter index and data cube.
+    """
+
+    def __init__(self, data_provider, cache=None):
+        super().__init__(cache)
+        self.provider = data_provider
+        self._rows = lru_cache(maxsize=8)(self._select_rows)
+        self._bounds = None
+
+    @property
+    def ready(self):
+        return self.provider.ready
+
+    @property
+    def version(self):
+        return self.provider.version
+
+    def load(self):
+        return self.provider.get()
+
+    def refresh(self):
+        return self.provider.refresh()
+
+    def clear_caches(self):
+        super().clear_caches()
+        self._rows.cache_clear()
+
+    def unload(self):
+        """
+        Drops the dataset and everything cached from it, the next read loads it again.
+        """
+        self.provider.unload()
+        self._bounds = None
+        self.clear_caches()
+        self.cache.clear()
+
+    def memory_usage(self):
+        """
+        (private, mapped) bytes of the loaded dataset, see `data.Dataset.memory_usage`, zeros when not loaded.
+        """
+        dataset = self.provider.dataset
+        return (0, 0) if dataset is None else dataset.memory_usage()
+
+    def bounds(self):
+        bounds = self._bounds
+        if bounds is None or bounds.version != self.version:
+            # the version is read before the dataset, a refresh in between makes it stale, never too new
+            self.load()
+            version, dataset = self.version, self.load()
+            bounds = self._bounds = frame_bounds(dataset.data, version)
+        return bounds
+
+    def time_series_store(self):
+        return self.load().time_series
+
+    def _select_rows(self, key):
+        filter_state = json.loads(key)
+        dataset = self.load()
+        with stage('filter'):
+            rows = dataset.filter_index.select(
+                filter_state['conditions'],
+                filter_state['age'],
+                filter_state['genders'],
+                filter_state['start_date'],
+                filter_state['end_date']
+            )
+            if len(rows) == len(dataset.data):
+                return dataset.data
+            return dataset.data.iloc[rows]
+
+    def rows(self, filter_state):
+        """
+        Returns the rows of `data` matching the normalized filter state.
+        The result is cached, so the table pages and all the charts share one filtered frame
+        per filter state. Do not modify the result.
+        """
+        return self._rows(filter_state_key(filter_state))
+
+    def _compute_cells(self, key):
+        filter_state = json.loads(key)
+        cells = self.load().cube.slice(filter_state)
+        if cells is None:
+            # bounds inside a bucket, aggregate the matching raw rows instead
+            cells = build_cells(self.rows(filter_state))
+        return cells
+
+    def client_cells(self):
+        """
+        Cells of the whole dataset over `CLIENT_DIMENSIONS`, None when the cube doesn't hold exact ages.
+        """
+        cube = self.load().cube
+        if not cube.whole_ages or cube.age_bucket_width != 1:
+            return None
+        cells = cube.cells.rename(columns={'Age Bucket': 'Age'})
+        measures = ['Count'] + [f'{measure} Sum' for measure in CUBE_MEASURES]
+        return cells.groupby(CLIENT_DIMENSIONS, observed=True, dropna=False)[measures].sum().reset_index()
+
+    def stay_histogram(self, filter_state):
+        """
+        Number of admissions per medical condition and length of stay.
+        """
+        return self.rows(filter_state).groupby(
+            ['Medical Condition', 'Length of Stay'], observed=True
+        ).size().reset_index(name='Count')
+
+    def table_page(self, filter_state, page_current, page_size, sort_by, filter_query):
+        """
+        Returns (records of the page, page count) of the filtered, sorted table.
+        """
+        table_frame = apply_table_query(self.rows(filter_state), sort_by, filter_query)
+
+        page_count = page_count_of(len(table_frame), page_size)
+        page_current = min(page_current or 0, page_count - 1)
+        page = table_frame.iloc[page_current * page_size: (page_current + 1) * page_size]
+        return page_records(page), page_count
+
+# Dimensions the charts group by, the filter-only dimensions (month, gender, age) are summed out by the query
+SQL_CELL_DIMENSIONS = ['Medical Condition', 'Admission Type', 'Blood Type', 'Medication']
+SQL_OPERATORS = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+SQLITE_TABLE = 'admissions'
+SQLITE_INDEXES = [
+    ['Medical Condition', 'Date of Admission'],
+    ['Date of Admission'],
+    ['Age'],
+]
+
+def quote(name):
+    """
+    SQL identifier of a column name, the column names contain spaces.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+def write_sqlite(data, path, table=SQLITE_TABLE):
+    """
+    Writes the preprocessed `data` frame into an SQLite database at `path`, dates as 'YYYY-MM-DD' text.
+    """
+    frame = data.copy()
+    for column in DATE_COLUMNS:
+        frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+    with sqlite3.connect(path) as connection:
+        frame.to_sql(table, connection, if_exists='replace', index=False, chunksize=100_000)
+        for columns in SQLITE_INDEXES:
+            name = quote('idx_' + '_'.join(columns).replace(' ', '_').lower())
+            connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {quote(table)} ({", ".join(map(quote, columns))})')
+    connection.close()
+
+def sqlite_version(path):
+    """
+    Data version of the database at `path`, from its size and modification time, so it is the same
+    in every process reading the same file.
+    """
+    stat = os.stat(path)
+    return hashlib.sha1(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()[:16]
+
+def sqlite_kind(declared_type):
+    """
+    Kind of an SQLite column for `convert_filter_value`, from its declared type as SQLite derives its affinity.
+    """
+    declared_type = (declared_type or '').upper()
+    if any(part in declared_type for part in ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')):
+        return 'numeric'
+    return 'text'
+
+class ConnectionPool:
+    """
+    Read-only SQLite connections shared by the callback threads, at most `size` open at once.
+    """
+
+    def __init__(self, path, size=4):
+        self.uri = 'file:' + pathname2url(os.path.abspath(path)) + '?mode=ro'
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+            try:
+                yield connection
+            finally:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+class SqliteSource(DataSource):
+    """
+    Source over an SQLite database. Filters become parameterized WHERE clauses, the database groups the rows,
+    only aggregates and the requested table page are transferred.
+    """
+
+    def __init__(self, path, pool_size=4, table=SQLITE_TABLE, cache=None):
+        super().__init__(cache)
+        self.path = path
+        self.table = quote(table)
+        self.pool = ConnectionPool(path, pool_size)
+        self.version = None
+        self._store = None
+        self._bounds = None
+        self._column_kinds = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._store is not None
+
+    def query(self, sql, params=(), parse_dates=None):
+        with stage('sql query'), self.pool.connection() as connection:
+            return pd.read_sql_query(sql, connection, params=params, parse_dates=parse_dates)
+
+    def _read(self):
+        # bounds and daily counts, the time series levels are rolled up from them
+        self._mtime = os.path.getmtime(self.path)
+        self.version = sqlite_version(self.path)
+        self._bounds = self._read_bounds()
+        daily_data = self.query(
+            f'SELECT "Date of Admission", "Medical Condition", COUNT(*) AS "Count" FROM {self.table} '
+            f'WHERE "Date of Admission" IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2',
+            parse_dates=['Date of Admission']
+        )
+        self._store = TimeSeriesStore(daily_data)
+
+    def load(self):
+        """
+        Reads the bounds and the daily counts once.
+        """
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._read()
+        return self._store
+
+    def refresh(self):
+        """
+        Reads the bounds and daily counts again when the database file changed, rows are never held here,
+        so nothing else needs updating. Returns True when it changed.
+        """
+        if self._store is None:
+            return False
+        with self._lock:
+            if os.path.getmtime(self.path) == self._mtime:
+                return False
+            self._read()
+        return True
+
+    def _read_bounds(self):
+        with self.pool.connection() as connection:
+            table_info = connection.execute(f'PRAGMA table_info({self.table})').fetchall()
+            columns = [row[1] for row in table_info]
+            self._column_kinds = {
+                row[1]: 'datetime' if row[1] in DATE_COLUMNS else sqlite_kind(row[2]) for row in table_info
+            }
+            conditions = [row[0] for row in connection.execute(
+                f'SELECT DISTINCT "Medical Condition" FROM {self.table} '
+                f'WHERE "Medical Condition" IS NOT NULL ORDER BY 1'
+            )]
+            # genders in order of appearance, like the in-memory source
+            genders = [row[0] for row in connection.execute(
+                f'SELECT "Gender" FROM {self.table} WHERE "Gender" IS NOT NULL GROUP BY 1 ORDER BY MIN(rowid)'
+            )]
+            min_age, max_age, start_date, end_date = connection.execute(
+                f'SELECT MIN("Age"), MAX("Age"), MIN("Date of Admission"), MAX("Date of Admission") FROM {self.table}'
+            ).fetchone()
+        return Bounds(
+            conditions=tuple(conditions),
+            genders=tuple(genders),
+            min_age=int(min_age),
+            max_age=int(max_age),
+            start_date=pd.Timestamp(start_date),
+            end_date=pd.Timestamp(end_date),
+            columns=tuple(columns),
+            version=self.version
+        )
+
+    def bounds(self):
+        self.load()
+        return self._bounds
+
+    def time_series_store(self):
+        return self.load()
+
+    def where(self, filter_state):
+        """
+        WHERE clause and its parameters selecting the rows of the filter state.
+        """
+        clauses, params = [], []
+        for column, values in (('Medical Condition', filter_state['conditions']), ('Gender', filter_state['genders'])):
+            clauses.append(f'{quote(column)} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+        clauses.append('"Age" BETWEEN ? AND ?')
+        params.extend(filter_state['age'])
+        if filter_state['start_date'] is not None:
+            clauses.append('"Date of Admission" >= ?')
+            params.append(filter_state['start_date'])
+        if filter_state['end_date'] is not None:
+            clauses.append('"Date of Admission" <= ?')
+            params.append(filter_state['end_date'])
+        return ' AND '.join(clauses), params
+
+    def _compute_cells(self, key):
+        filter_state = json.loads(key)
+        where, params = self.where(filter_state)
+        dimensions = ', '.join(map(quote, SQL_CELL_DIMENSIONS))
+        measures = ', '.join(
+            f'SUM({quote(measure)}) AS {quote(measure + " Sum")}, '
+            f'SUM({quote(measure)} * {quote(measure)}) AS {quote(measure + " Sum of Squares")}'
+            for measure in CUBE_MEASURES
+        )
+        return self.query(
+            f'SELECT {dimensions}, COUNT(*) AS "Count", {measures} FROM {self.table} '
+            f'WHERE {where} GROUP BY {dimensions}',
+            params
+        )
+
+    def client_cells(self):
+        dimensions = ', '.join(map(quote, CLIENT_DIMENSIONS))
+        measures = ', '.join(f'SUM({quote(measure)}) AS {quote(measure + " Sum")}' for measure in CUBE_MEASURES)
+        cells = self.query(
+            f'SELECT {dimensions}, COUNT(*) AS "Count", {measures} FROM {self.table} GROUP BY {dimensions}'
+        )
+        ages = cells['Age'].dropna()
+        return cells if (ages % 1 == 0).all() else None
+
+    def stay_histogram(self, filter_state):
+        where, params = self.where(filter_state)
+        return self.query(
+            f'SELECT "Medical Condition", "Length of Stay", COUNT(*) AS "Count" FROM {self.table} '
+            f'WHERE {where} AND "Length of Stay" IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2',
+            params
+        )
+
+    def _table_filters(self, filter_query):
+        columns = self.bounds().columns
+        clauses, params = [], []
+        for filter_part in (filter_query or '').split(' && '):
+            col_name, operator, value = split_filter_part(filter_part)
+            # column names can't be parameters, only known ones get into the query
+            if col_name not in columns:
+                continue
+            column = quote(col_name)
+            filter_value = convert_filter_value(value, operator, self._column_kinds[col_name])
+            if filter_value is None:
+                continue
+            if isinstance(filter_value, pd.Timestamp):
+                filter_value = filter_value.strftime('%Y-%m-%d')
+
+            if operator in SQL_OPERATORS:
+                clauses.append(f'{column} {SQL_OPERATORS[operator]} ?')
+                params.append(filter_value)
+            elif operator == 'contains':
+                clauses.append(f'instr(CAST({column} AS TEXT), ?) > 0')
+                params.append(str(filter_value))
+            elif operator == 'datestartswith':
+                clauses.append(f'substr(CAST({column} AS TEXT), 1, ?) = ?')
+                params.extend([len(str(filter_value)), str(filter_value)])
+        return clauses, params
+
+    def table_page(self, filter_state, page_current, page_size, sort_by, filter_query):
+        where, params = self.where(filter_state)
+        clauses, filter_params = self._table_filters(filter_query)
+        where = ' AND '.join([where] + clauses)
+        params = params + filter_params
+
+        columns = self.bounds().columns
+        order = ', '.join(
+            f'{quote(col["column_id"])} {"ASC" if col["direction"] == "asc" else "DESC"}'
+            for col in (sort_by or []) if col['column_id'] in columns
+        )
+
+        with stage('sql query'), self.pool.connection() as connection:
+            rows = connection.execute(f'SELECT COUNT(*) FROM {self.table} WHERE {where}', params).fetchone()[0]
+        page_count = page_count_of(rows, page_size)
+        page_current = min(page_current or 0, page_count - 1)
+        page = self.query(
+            f'SELECT * FROM {self.table} WHERE {where} '
+            + (f'ORDER BY {order} ' if order else '')
+            + 'LIMIT ? OFFSET ?',
+            params + [page_size, page_current * page_size],
+            parse_dates=[column for column in DATE_COLUMNS if column in columns]
+        )
+        return page_records(page), page_count
+
+def default_sqlite_path():
+    """
+    Path of data/hospital_data.sqlite in the project root.
+    """
+    return os.path.splitext(default_csv_path())[0] + '.sqlite'
+
+def create_source():
+    """
+    Data source configured by the `HEALTH_DATA_SOURCE`, `HEALTH_SQLITE_PATH` and `HEALTH_SQLITE_POOL` variables.
+    """
+    kind = os.environ.get('HEALTH_DATA_SOURCE', 'csv')
+    if kind == 'csv':
+        return FrameSource(provider)
+    if kind == 'sqlite':
+        return SqliteSource(
+            os.environ.get('HEALTH_SQLITE_PATH') or default_sqlite_path(),
+            int(os.environ.get('HEALTH_SQLITE_POOL', 4))
+        )
+    raise ValueError(f"Unknown HEALTH_DATA_SOURCE '{kind}', use 'csv' or 'sqlite'")
+
+source = create_source()
+RELOAD_INTERVAL = float(os.environ.get('HEALTH_RELOAD_INTERVAL', 0))
@@ -0,0 +1,162 @@
+"""
+Typed columnar storage of the preprocessed hospital data.
+`dashboard-ingest` converts the CSV once into a directory of `.npy` files (one per column)
+plus `meta.json`, `load_data` then memory-maps it instead of parsing the CSV.
+Memory-mapped pages are shared by every worker process reading the same files.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+
+# Columns stored with a fixed dtype, everything else is stored by its kind
+COLUMN_DTYPES = {
+    'Billing Amount': 'float32',
+    'Age': 'int16',
+    'Length of Stay': 'int16',
+    'Room Number': 'int16',
+}
+
+def columns_path(csv_path):
+    """
+    Directory of the columnar copy of `csv_path`, placed next to it.
+    """
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+def _codes_dtype(categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if len(categories) < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def _column_array(column, dtype):
+    # integer columns fall back to float32 when they hold missing values
+    if dtype.startswith('int') and column.isna().any():
+        dtype = 'float32'
+    return column.to_numpy(dtype=dtype)
+
+def write_columns(data, directory, source_path=None):
+    """
+    Writes the preprocessed `data` frame into `directory`.
+    Text columns become categorical codes with sorted categories, dates stay datetime64.
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+
+    for position, name in enumerate(data.columns):
+        column = data[name]
+        file_name = f'{position:02d}.npy'
+        entry = {'name': name, 'file': file_name}
+
+        if name in COLUMN_DTYPES:
+            array = _column_array(column, COLUMN_DTYPES[name])
+            entry['kind'] = 'array'
+        elif pd.api.types.is_datetime64_any_dtype(column):
+            array = column.to_numpy(dtype='datetime64[ns]')
+            entry['kind'] = 'array'
+        elif pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+            array = column.to_numpy()
+            entry['kind'] = 'array'
+        else:
+            categorical = column.astype('category')
+            categorical = categorical.cat.reorder_categories(sorted(categorical.cat.categories))
+            categories = categorical.cat.categories
+            array = categorical.cat.codes.to_numpy(dtype=_codes_dtype(categories))
+            entry['kind'] = 'category'
+            entry['categories'] = categories.tolist()
+
+        np.save(os.path.join(directory, file_name), array, allow_pickle=False)
+        columns.append(entry)
+
+    meta = {
+        'version': FORMAT_VERSION,
+        'rows': len(data),
+        'source_mtime': os.path.getmtime(source_path) if source_path else None,
+        'columns': columns,
+    }
+    # meta.json is written last, a directory without it is never read
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def read_meta(directory):
+    """
+    Returns the `meta.json` content, or None when the directory holds no columnar data.
+    """
+    try:
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != FORMAT_VERSION:
+        return None
+    return meta
+
+def is_current(directory, csv_path):
+    """
+    True when `directory` holds columnar data converted from the current version of `csv_path`.
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return meta['source_mtime'] == os.path.getmtime(csv_path)
+
+def read_columns(directory, mmap=True):
+    """
+    Builds the data frame from `directory`. With `mmap` the columns are memory-mapped
+    read-only arrays, neither pandas nor this function copies them.
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No columnar hospital data in '{directory}'")
+
+    columns = {}
+    for entry in meta['columns']:
+        array = np.load(os.path.join(directory, entry['file']), mmap_mode='r' if mmap else None)
+        if entry['kind'] == 'category':
+            columns[entry['name']] = pd.Categorical.from_codes(array, entry['categories'])
+        else:
+            columns[entry['name']] = array
+
+    return pd.DataFrame(columns, copy=False)
+
+def main():
+    """
+    Entry point of `dashboard-ingest`, converts the hospital CSV into the columnar format or an SQLite database.
+    """
+    # imported here, data.py imports this module
+    from .data import default_csv_path, read_csv, stream_csv
+    from .sources import write_sqlite
+
+    parser = argparse.ArgumentParser(description='Convert the hospital CSV into memory-mappable columns.')
+    parser.add_argument('csv_path', nargs='?', default=None, help='CSV file, data/hospital_data.csv by default')
+    parser.add_argument('--output', default=None, help='output directory, <csv name>.columns by default')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream the CSV this many rows at a time, for files larger than memory')
+    parser.add_argument('--sqlite', default=None,
+                        help='write an SQLite database for HEALTH_DATA_SOURCE=sqlite to this path instead')
+    args = parser.parse_args()
+
+    csv_path = args.csv_path or default_csv_path()
+    output = args.output or columns_path(csv_path)
+
+    start = time.perf_counter()
+    if args.chunksize:
+        data = stream_csv(csv_path, args.chunksize)[0]
+    else:
+        data = read_csv(csv_path)
+    if args.sqlite:
+        output = args.sqlite
+        write_sqlite(data, output)
+    else:
+        write_columns(data, output, source_path=csv_path)
+    print(f"Wrote {len(data):,} rows to {output} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Several hospitals served by one server, each with a dataset of its own (a tenant).
+Turned on with `HEALTH_TENANTS_DIR`: every `<tenant>.csv` in that directory is a tenant, its dashboard is served
+on `/<tenant>`. Converting the CSV files with `dashboard-ingest` first is what keeps memory flat: the columnar copy
+is memory-mapped, so the rows of a hospital are held once in the page cache of the host, shared by every worker
+process mapping them, instead of once per worker.
+
+The tenant of a request is the `X-Health-Tenant` header when a proxy sets it (e.g. from the host name),
+otherwise the first segment of the page path, which the requests Dash makes carry in their Referer.
+Every tenant has its own data source (dataset, filter index, cube and time series, built on first use)
+and its own result cache. Memory is accounted per tenant, and the least recently used datasets are unloaded when more
+than `HEALTH_MAX_TENANTS` (8 by default) are loaded or their private memory exceeds `HEALTH_TENANT_MEMORY_MB`.
+Without `HEALTH_TENANTS_DIR` the single `sources.source` serves every request.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .cache import create_cache
+from .data import DataProvider
+from .sources import FrameSource, source
+
+logger = logging.getLogger(__name__)
+
+TENANT_HEADER = 'X-Health-Tenant'
+# tenant names are path segments and cache directory names
+TENANT_NAME = re.compile(r'^[A-Za-z0-9][\w-]*$')
+DEFAULT_MAX_TENANTS = 8
+
+class BackgroundLoader:
+    """
+    Loads a data source on a daemon thread, at most one load at a time.
+    """
+
+    def __init__(self, data_source, name='dataset-loader'):
+        self.data_source = data_source
+        self.name = name
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts loading unless the source is loaded or loading already, returns the loading thread or None.
+        """
+        with self._lock:
+            if self.data_source.ready:
+                return None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._load, name=self.name, daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def _load(self):
+        try:
+            self.data_source.load()
+        except Exception:
+            logger.exception('Loading %s failed', self.name)
+
+class Tenant:
+    """
+    One dataset with its own data source and result cache, loaded on first use.
+    `memory` holds the (private, mapped) bytes of the loaded dataset once measured, None otherwise.
+    """
+
+    def __init__(self, name, csv_path, chunksize=None):
+        self.name = name
+        self.source = FrameSource(DataProvider(csv_path, chunksize), cache=create_cache(namespace=name))
+        self.last_used = 0.0
+        self.memory = None
+        self.loader = BackgroundLoader(self.source, f'dataset-loader-{name}')
+
+    @property
+    def loaded(self):
+        return self.source.ready
+
+    def unload(self):
+        self.source.unload()
+        self.memory = None
+        logger.info('Unloaded the dataset of tenant %s', self.name)
+
+class TenantRegistry:
+    """
+    Tenants of the CSV files in `directory`, created on their first request.
+    Loaded datasets are unloaded least recently used first when more than `max_loaded` are loaded
+    or their private bytes exceed `memory_budget` (0 disables either limit).
+    """
+
+    def __init__(self, directory, max_loaded=DEFAULT_MAX_TENANTS, memory_budget=0, chunksize=None):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget
+        self.chunksize = chunksize
+        self.unloads = 0
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def csv_path(self, name):
+        return os.path.join(self.directory, name + '.csv')
+
+    def names(self):
+        """
+        Names of the tenants, from the CSV files in the directory now.
+        """
+        return sorted(
+            name[:-len('.csv')] for name in os.listdir(self.directory)
+            if name.endswith('.csv') and TENANT_NAME.match(name[:-len('.csv')])
+        )
+
+    def get(self, name):
+        """
+        The `Tenant` called `name`, marked as used now. None for names without a CSV file.
+        A dataset loaded since the last call is measured, and other datasets are unloaded when it brings
+        the registry over its limits.
+        """
+        if not name or not TENANT_NAME.match(name):
+            return None
+        with self._lock:
+            tenant = self._tenants.get(name)
+            if tenant is None:
+                if not os.path.isfile(self.csv_path(name)):
+                    return None
+                tenant = self._tenants[name] = Tenant(name, self.csv_path(name), self.chunksize)
+            tenant.last_used = time.monotonic()
+            if tenant.loaded and tenant.memory is None:
+                tenant.memory = tenant.source.memory_usage()
+                self._enforce_limits(tenant)
+        return tenant
+
+    def _enforce_limits(self, keep):
+        # least recently used first, the tenant in use stays loaded even when it alone is over the budget
+        others = sorted(
+            (tenant for tenant in self._tenants.values() if tenant.loaded and tenant is not keep),
+            key=lambda tenant: tenant.last_used
+        )
+        loaded = len(others) + 1
+        private = sum((tenant.memory or (0, 0))[0] for tenant in others) + keep.memory[0]
+        while others and (
+            (self.max_loaded and loaded > self.max_loaded)
+            or (self.memory_budget and private > self.memory_budget)
+        ):
+            tenant = others.pop(0)
+            private -= (tenant.memory or (0, 0))[0]
+            loaded -= 1
+            tenant.unload()
+            self.unloads += 1
+
+    def memory_report(self):
+        """
+        Per tenant created so far: whether its dataset is loaded, its private and mapped bytes
+        (measured on the first request after loading), seconds since its last use and its result cache entries.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tenants = list(self._tenants.values())
+        return {
+            tenant.name: {
+                'loaded': tenant.loaded,
+                'private_bytes': (tenant.memory or (0, 0))[0],
+                'mapped_bytes': (tenant.memory or (0, 0))[1],
+                'idle_seconds': now - tenant.last_used,
+                'cache_entries': tenant.source.cache.stats()['entries'],
+            }
+            for tenant in tenants
+        }
+
+    def cache_stats(self):
+        """
+        `ResultCache.stats()` of every tenant created so far.
+        """
+        with self._lock:
+            tenants = list(self._tenants.values())
+        return {tenant.name: tenant.source.cache.stats() for tenant in tenants}
+
+    def watch(self, interval):
+        """
+        Reloads every loaded dataset every `interval` seconds on a daemon thread, see `DataSource.reload`.
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                with self._lock:
+                    tenants = [tenant for tenant in self._tenants.values() if tenant.loaded]
+                for tenant in tenants:
+                    try:
+                        if tenant.source.reload():
+                            # measured again on its next request
+                            tenant.memory = None
+                    except Exception:
+                        logger.exception('Reloading the dataset of tenant %s failed', tenant.name)
+
+        thread = threading.Thread(target=run, name='tenant-watcher', daemon=True)
+        thread.start()
+        return thread
+
+def create_registry():
+    """
+    `TenantRegistry` configured by `HEALTH_TENANTS_DIR`, `HEALTH_MAX_TENANTS` and `HEALTH_TENANT_MEMORY_MB`,
+    None when serving a single dataset.
+    """
+    directory = os.environ.get('HEALTH_TENANTS_DIR')
+    if not directory:
+        return None
+    return TenantRegistry(
+        directory,
+        max_loaded=int(os.environ.get('HEALTH_MAX_TENANTS', DEFAULT_MAX_TENANTS)),
+        memory_budget=float(os.environ.get('HEALTH_TENANT_MEMORY_MB', 0)) * 2 ** 20,
+        chunksize=int(os.environ.get('HEALTH_CSV_CHUNKSIZE', 0)) or None
+    )
+
+registry = create_registry()
+# loads the single dataset for servers not started by `run.main` (e.g. gunicorn serving `app.server`)
+source_loader = BackgroundLoader(source)
+
+def request_tenant_name():
+    """
+    Tenant named by the current request: the `X-Health-Tenant` header, or the first segment of the page path.
+    """
+    from flask import request
+
+    name = request.headers.get(TENANT_HEADER)
+    if name:
+        return name
+    path = request.path
+    if path.startswith('/_') or path.startswith('/assets/'):
+        # callback, layout and asset requests of a page, the page is their referrer
+        path = urlsplit(request.referrer or '').path
+    return path.strip('/').split('/')[0] or None
+
+def current_tenant():
+    """
+    `Tenant` of the current request, None when serving a single dataset, outside requests
+    or for a request naming no known tenant.
+    """
+    from flask import g, has_request_context
+
+    if registry is None or not has_request_context():
+        return None
+    if 'health_tenant' not in g:
+        g.health_tenant = registry.get(request_tenant_name())
+    return g.health_tenant
+
+def current_source():
+    """
+    Data source of the current request, `sources.source` when serving a single dataset.
+    A request naming no known tenant gets a 404 response.
+    """
+    from werkzeug.exceptions import NotFound
+
+    if registry is None:
+        return source
+    tenant = current_tenant()
+    if tenant is None:
+        raise NotFound('Unknown tenant')
+    return tenant.source
+
+def tenant_name():
+    """
+    Name of the current request's tenant, what the render pool needs to find its data source.
+    """
+    tenant = current_tenant()
+    return tenant.name if tenant is not None else None
+
+def tenant_source(name):
+    """
+    Data source of the tenant called `name`, `sources.source` for None.
+    """
+    if name is None:
+        return source
+    tenant = registry.get(name) if registry is not None else None
+    if tenant is None:
+        raise LookupError(f"Unknown tenant '{name}'")
+    return tenant.source
+
+def start_loading():
+    """
+    Starts loading the dataset of the current request (its tenant's, or the single one) on a daemon thread,
+    the loading shell is served meanwhile. Returns the loading thread, None when nothing is loading.
+    """
+    if registry is None:
+        return source_loader.start()
+    tenant = current_tenant()
+    return tenant.loader.start() if tenant is not None else None
@@ -1,11 +1,20 @@
 """
 Originally called `CONSTANTS`, as the only constant in project is style (possibly OS path), named theme for now.
+The chart style is a plotly template, registered once as 'health' on top of the default 'plotly' template.
 """
-def apply_chart_theme(fig):
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from .metrics import stage
+
+CHART_TEMPLATE = 'health'
+
+def build_chart_template():
     """
-    Applies a consistent chart theme (layout, fonts, colors) to any Plotly figure.
+    Consistent chart theme (layout, fonts, colors), as a template extending the default plotly one.
     """
-    fig.update_layout(
+    template = go.layout.Template(pio.templates['plotly'])
+    template.layout.update(
         title_font=dict(size=16, color='#333', family='Arial'),
         font=dict(size=12, color='#333', family='Arial'),
         plot_bgcolor='#f9f9f9',
@@ -13,4 +22,14 @@ def apply_chart_theme(fig):
         legend=dict(title_font=dict(size=12), font=dict(size=10)),
         margin=dict(l=20, r=20, t=40, b=20)
     )
+    return template
+
+pio.templates[CHART_TEMPLATE] = build_chart_template()
+
+def apply_chart_theme(fig):
+    """
+    Applies the chart theme to any Plotly figure.
+    """
+    with stage('chart theme'):
+        fig.update_layout(template=CHART_TEMPLATE)
     return fig
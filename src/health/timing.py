@@ -0,0 +1,24 @@
+"""
+Startup timing instrumentation, every phase (imports, load, preprocessing, layout build) is logged and kept.
+"""
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Duration in seconds of the last run of every phase, in the order the phases first ran
+STARTUP_TIMINGS = OrderedDict()
+
+@contextmanager
+def startup_phase(name):
+    """
+    Times the enclosed block as the startup phase `name`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = time.perf_counter() - start
+        logger.info('Startup phase %s took %.3fs', name, STARTUP_TIMINGS[name])
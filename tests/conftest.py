@@ -0,0 +1,53 @@
+"""
+Shared fixtures. Datasets come from the synthetic generator of the benchmarks.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from synthetic import write_csv  # noqa: E402
+
+from health.callbacks import normalize_filter_state  # noqa: E402
+from health.data import DataProvider  # noqa: E402
+from health.sources import FrameSource  # noqa: E402
+
+@pytest.fixture
+def admissions_csv(tmp_path):
+    """
+    Path of a CSV with 300 random admissions.
+    """
+    path = str(tmp_path / 'admissions.csv')
+    write_csv(300, path, seed=1)
+    return path
+
+@pytest.fixture
+def frame_source(admissions_csv):
+    """
+    Loaded `FrameSource` over `admissions_csv`.
+    """
+    data_source = FrameSource(DataProvider(admissions_csv))
+    data_source.load()
+    return data_source
+
+def append_admissions(path, rows, seed=2):
+    """
+    Appends `rows` random admissions to the CSV at `path`, like a hospital system exporting new ones.
+    """
+    extra = path + '.extra'
+    write_csv(rows, extra, seed=seed)
+    with open(extra) as source, open(path, 'a') as target:
+        next(source)
+        target.writelines(source)
+    os.remove(extra)
+
+def full_state(data_source):
+    """
+    Normalized filter state selecting every row of `data_source`.
+    """
+    bounds = data_source.bounds()
+    return normalize_filter_state(
+        bounds.conditions, [bounds.min_age, bounds.max_age], bounds.genders, None, None, bounds.version
+    )
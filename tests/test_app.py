@@ -0,0 +1,18 @@
+from health import tenants
+from health.app import app
+from health.data import DataProvider
+from health.sources import FrameSource
+
+def test_layout_loads_the_dataset_without_run_main(monkeypatch, admissions_csv):
+    # served like gunicorn serves `app.server`, nothing but the first page starts the load
+    data_source = FrameSource(DataProvider(admissions_csv))
+    monkeypatch.setattr(tenants, 'source', data_source)
+    monkeypatch.setattr(tenants, 'source_loader', tenants.BackgroundLoader(data_source))
+    client = app.server.test_client()
+
+    assert 'Loading admissions data' in client.get('/_dash-layout').get_data(as_text=True)
+    thread = tenants.start_loading()
+    if thread is not None:
+        thread.join()
+    assert data_source.ready
+    assert 'filter-state' in client.get('/_dash-layout').get_data(as_text=True)
@@ -0,0 +1,11 @@
+from conftest import full_state
+
+from health.callbacks import summarize
+
+def test_summary_averages_have_one_decimal(frame_source):
+    data = frame_source.load().data
+    total_patients, average_age, total_billing, average_stay = summarize(full_state(frame_source), frame_source)
+    assert total_patients == len(data)
+    assert average_age == f"{data['Age'].mean():.1f}"
+    assert average_stay == f"{data['Length of Stay'].mean():.1f}"
+    assert total_billing.startswith('$')
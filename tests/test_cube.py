@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from health.cube import DataCube
+from health.data import load_dataset
+
+def filter_rows(data, filter_state):
+    mask = (
+        data['Medical Condition'].isin(filter_state['conditions']) & data['Gender'].isin(filter_state['genders']) &
+        (data['Age'] >= filter_state['age'][0]) & (data['Age'] <= filter_state['age'][1])
+    )
+    if filter_state['start_date'] is not None:
+        mask &= data['Date of Admission'] >= filter_state['start_date']
+    if filter_state['end_date'] is not None:
+        mask &= data['Date of Admission'] <= filter_state['end_date']
+    return data[mask]
+
+def test_cube_cells_match_a_groupby_of_the_rows(admissions_csv):
+    data = load_dataset(admissions_csv).data
+    cube = DataCube(data)
+    conditions = list(data['Medical Condition'].cat.categories)
+    genders = list(data['Gender'].cat.categories)
+    months = pd.date_range(data['Date of Admission'].min(), data['Date of Admission'].max(), freq='MS')
+    rng = np.random.default_rng(5)
+    for _ in range(30):
+        first, last = sorted(rng.choice(len(months), 2))
+        filter_state = {
+            'conditions': list(rng.choice(conditions, rng.integers(1, len(conditions) + 1), replace=False)),
+            'genders': list(rng.choice(genders, rng.integers(1, len(genders) + 1), replace=False)),
+            'age': sorted(rng.integers(0, 100, 2).tolist()),
+            'start_date': months[first] if rng.random() < 0.8 else None,
+            'end_date': months[last] + pd.offsets.MonthEnd(0) if rng.random() < 0.8 else None,
+        }
+        cells = cube.slice(filter_state)
+        rows = filter_rows(data, filter_state)
+        for dimension in ('Admission Type', 'Blood Type', 'Medication'):
+            by_cells = cells.groupby(dimension, observed=True)[['Count', 'Billing Amount Sum']].sum()
+            by_rows = rows.groupby(dimension, observed=True)['Billing Amount'].agg(['size', 'sum'])
+            by_cells = by_cells[by_cells['Count'] > 0]
+            assert by_cells.index.tolist() == by_rows.index.tolist()
+            np.testing.assert_array_equal(by_cells['Count'], by_rows['size'])
+            np.testing.assert_allclose(by_cells['Billing Amount Sum'], by_rows['sum'])
+
+def test_bounds_inside_a_bucket_are_left_to_the_rows(admissions_csv):
+    data = load_dataset(admissions_csv).data
+    cube = DataCube(data)
+    filter_state = {
+        'conditions': list(data['Medical Condition'].cat.categories),
+        'genders': list(data['Gender'].cat.categories),
+        'age': [0, 200],
+        'start_date': data['Date of Admission'].min() + pd.Timedelta(days=40),
+        'end_date': None,
+    }
+    if filter_state['start_date'].day == 1:
+        filter_state['start_date'] += pd.Timedelta(days=1)
+    assert cube.slice(filter_state) is None
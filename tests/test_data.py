@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import append_admissions
+
+from health import data
+from health.data import DataProvider, aggregate_daily, load_dataset, read_csv, stream_csv
+
+def test_time_series_levels_build_without_deprecated_aliases(admissions_csv):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        dataset = load_dataset(admissions_csv)
+    levels = dataset.time_series.levels
+    assert list(levels) == ['day', 'week', 'month', 'quarter']
+    for level in levels.values():
+        assert level['Count'].sum() == 300
+    assert (levels['month']['Date of Admission'].dt.is_month_end).all()
+    assert (levels['quarter']['Date of Admission'].dt.is_quarter_end).all()
+
+@pytest.mark.parametrize('chunksize', [None, 128])
+def test_rows_appended_during_the_load_are_read_once(admissions_csv, monkeypatch, chunksize):
+    load = data.load_dataset
+
+    def load_while_appending(*args, **kwargs):
+        append_admissions(admissions_csv, 100)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(data, 'load_dataset', load_while_appending)
+    provider = DataProvider(admissions_csv, chunksize)
+    assert len(provider.get().data) == 400
+    assert provider.get().cube.cells['Count'].sum() == 400
+    assert not provider.refresh()
+    assert len(provider.get().data) == 400
+
+def test_stream_csv_matches_read_csv(admissions_csv):
+    frame = pd.read_csv(admissions_csv)
+    # sorted, so most conditions and medications appear first in a later chunk, and a few values are missing
+    frame = frame.sort_values(['Medical Condition', 'Medication'], kind='stable')
+    frame.loc[frame.index[[5, 150]], ['Gender', 'Medication']] = np.nan
+    frame.to_csv(admissions_csv, index=False)
+
+    streamed, daily_data, cells = stream_csv(admissions_csv, chunksize=32)
+    read = read_csv(admissions_csv)
+
+    assert list(streamed.columns) == list(read.columns)
+    for name in read.columns:
+        if isinstance(streamed[name].dtype, pd.CategoricalDtype):
+            assert list(streamed[name].cat.categories) == sorted(read[name].dropna().unique())
+            pd.testing.assert_series_equal(streamed[name].astype(object), read[name].astype(object))
+        elif pd.api.types.is_datetime64_any_dtype(read[name]):
+            pd.testing.assert_series_equal(streamed[name], read[name], check_dtype=False)
+        else:
+            np.testing.assert_allclose(streamed[name].astype('float64'), read[name].astype('float64'), rtol=1e-6)
+    pd.testing.assert_frame_equal(daily_data.reset_index(drop=True), aggregate_daily(read).reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
+    assert cells['Count'].sum() == len(read)
@@ -0,0 +1,60 @@
+import base64
+
+import numpy as np
+import pytest
+
+from health.encoding import binary_arrays, loads, to_json, typed_array
+
+def decode(spec):
+    # what plotly.js does with a typed array spec
+    array = np.frombuffer(base64.b64decode(spec['bdata']), dtype=spec['dtype'])
+    if 'shape' in spec:
+        array = array.reshape([int(size) for size in spec['shape'].split(',')])
+    return array
+
+@pytest.mark.parametrize('array, dtype', [
+    (np.array([0, 5, 255]), 'u1'),
+    (np.array([-3, 0, 127]), 'i1'),
+    (np.array([0, 40000]), 'u2'),
+    (np.array([-40000, 7]), 'i4'),
+    (np.array([0, 2 ** 31]), 'u4'),
+    (np.array([-1, 2 ** 40]), 'f8'),
+    (np.array([], dtype=np.int64), 'u1'),
+    (np.array([0.5, -2.25, np.nan]), 'f8'),
+    (np.array([0.5, 3.0], dtype=np.float32), 'f4'),
+    (np.arange(6, dtype=np.int16).reshape(2, 3), 'u1'),
+])
+def test_typed_arrays_round_trip(array, dtype):
+    spec = typed_array(array)
+    assert spec['dtype'] == dtype
+    np.testing.assert_array_equal(decode(spec), array)
+
+def test_arrays_without_typed_array_stay_lists():
+    assert typed_array(np.array([True, False])) is None
+    assert typed_array(np.array(['a', 'b'], dtype=object)) is None
+    assert typed_array(np.zeros((2, 2, 2))) is None
+
+def test_binary_figures_decode_to_the_json_ones():
+    figure = {
+        'data': [
+            {'type': 'bar', 'x': np.array(['a', 'b'], dtype=object), 'y': np.array([3, 4])},
+            {'type': 'box', 'q1': np.array([1.5]), 'name': 'c', 'marker': {'color': 'red'}},
+        ],
+        'layout': {'title': {'text': 'Counts'}},
+    }
+    plain = loads(to_json(figure))
+    binary = loads(to_json(figure, 'binary'))
+
+    def decoded(value):
+        if isinstance(value, dict):
+            if 'bdata' in value:
+                return decode(value).tolist()
+            return {key: decoded(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [decoded(item) for item in value]
+        return value
+
+    assert binary['data'][0]['y']['dtype'] == 'u1'
+    assert binary['data'][0]['x'] == ['a', 'b']
+    assert decoded(binary) == plain
+    assert binary_arrays(figure)['data'][0]['y'] == typed_array(figure['data'][0]['y'])
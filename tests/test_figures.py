@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from health.figures import box_statistics, medication_bar_traces
+
+def test_box_statistics_match_the_raw_rows():
+    rng = np.random.default_rng(3)
+    raw = pd.DataFrame({
+        'Group': [*rng.choice(['a', 'b', 'c'], 500), 'd', 'e', 'e'],
+        'Stay': [*rng.integers(1, 40, 500), 7, 3, 9],
+    })
+    raw.loc[:9, 'Stay'] = 200 + np.arange(10)
+    histogram = raw.groupby(['Group', 'Stay']).size().reset_index(name='Count')
+
+    stats, outliers = box_statistics(histogram, 'Group', 'Stay', max_outliers=3)
+
+    for name, part in raw.groupby('Group'):
+        values = np.sort(part['Stay'].to_numpy())
+        # plotly.js interpolates at rank n * q - 0.5, numpy's 'hazen' method
+        quartiles = np.quantile(values, [0.25, 0.5, 0.75], method='hazen')
+        assert stats.loc[name, ['q1', 'median', 'q3']].tolist() == pytest.approx(quartiles)
+        q1, q3 = quartiles[0], quartiles[2]
+        inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+        assert (stats.loc[name, 'lowerfence'], stats.loc[name, 'upperfence']) == (inside.min(), inside.max())
+        outlying = values[(values < inside.min()) | (values > inside.max())]
+        if len(outlying) <= 3:
+            assert list(outliers.get(name, [])) == list(outlying)
+        else:
+            sample = outliers[name]
+            assert len(sample) == 3 and (sample[0], sample[-1]) == (outlying[0], outlying[-1])
+            assert np.isin(sample, outlying).all()
+
+def test_tied_medications_keep_their_order():
+    medications = [f'Medication {index:02d}' for index in range(40)]
+    cells = pd.DataFrame({'Medication': medications, 'Count': [5, 3] * 20})
+    structure, updates = medication_bar_traces(cells)
+    assert structure == medications[0::2] + medications[1::2]
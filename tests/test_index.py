@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from health.data import load_dataset
+from health.index import FilterIndex
+
+@pytest.fixture
+def admissions(admissions_csv):
+    data = load_dataset(admissions_csv).data.copy()
+    # rows without a condition, gender or age match no filter state
+    data.loc[[3, 50], 'Medical Condition'] = np.nan
+    data.loc[[7, 120], 'Gender'] = np.nan
+    data.loc[[11], 'Age'] = np.nan
+    return data
+
+def mask_rows(data, conditions, age, genders, start_date, end_date):
+    mask = (
+        data['Medical Condition'].isin(conditions) & data['Gender'].isin(genders) &
+        (data['Age'] >= age[0]) & (data['Age'] <= age[1])
+    )
+    if start_date is not None:
+        mask &= data['Date of Admission'] >= start_date
+    if end_date is not None:
+        mask &= data['Date of Admission'] <= end_date
+    return np.flatnonzero(mask.to_numpy())
+
+def test_select_matches_a_boolean_mask(admissions):
+    index = FilterIndex(admissions)
+    conditions = list(admissions['Medical Condition'].dropna().unique())
+    genders = list(admissions['Gender'].dropna().unique())
+    dates = admissions['Date of Admission'].sort_values().to_list()
+    rng = np.random.default_rng(4)
+    for _ in range(50):
+        state = (
+            list(rng.choice(conditions, rng.integers(0, len(conditions) + 1), replace=False)),
+            sorted(rng.integers(0, 100, 2).tolist()),
+            list(rng.choice(genders, rng.integers(0, len(genders) + 1), replace=False)),
+            dates[rng.integers(len(dates))] if rng.random() < 0.7 else None,
+            dates[rng.integers(len(dates))] if rng.random() < 0.7 else None,
+        )
+        np.testing.assert_array_equal(index.select(*state), mask_rows(admissions, *state))
+
+def test_selecting_every_category_skips_rows_without_one(admissions):
+    index = FilterIndex(admissions)
+    state = (index.conditions, [0, 200], index.genders, None, None)
+    rows = index.select(*state)
+    np.testing.assert_array_equal(rows, mask_rows(admissions, *state))
+    assert not {3, 50, 7, 120, 11} & set(rows)
@@ -0,0 +1,119 @@
+import cProfile
+import gzip
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from conftest import full_state, write_csv
+
+from health import metrics, tenants
+from health.app import app
+from health.callbacks import register_callbacks
+from health.metrics import CALLBACK_BYTES, CALLBACK_PATH, CALLBACK_SECONDS, register_metrics, render_metrics
+from health.tenants import TenantRegistry
+
+TABLE_OUTPUT = '..data-table.data...data-table.page_count..'
+
+@pytest.fixture
+def client(monkeypatch, frame_source):
+    monkeypatch.setattr(tenants, 'source', frame_source)
+    if TABLE_OUTPUT not in app.callback_map:
+        register_callbacks(app)
+    CALLBACK_SECONDS.clear()
+    CALLBACK_BYTES.clear()
+    return app.server.test_client()
+
+def table_request(state, output=TABLE_OUTPUT):
+    return {
+        'output': output,
+        'outputs': [{'id': 'data-table', 'property': 'data'}, {'id': 'data-table', 'property': 'page_count'}],
+        'inputs': [
+            {'id': 'filter-state', 'property': 'data', 'value': state},
+            {'id': 'data-table', 'property': 'page_current', 'value': 0},
+            {'id': 'data-table', 'property': 'page_size', 'value': 100},
+            {'id': 'data-table', 'property': 'sort_by', 'value': []},
+            {'id': 'data-table', 'property': 'filter_query', 'value': ''},
+        ],
+        'changedPropIds': [],
+    }
+
+def test_unregistered_outputs_are_labelled_unknown(client, frame_source):
+    body = table_request(full_state(frame_source), output='..made-up-output.children..')
+    body['outputs'] = [{'id': 'made-up-output', 'property': 'children'}]
+    client.post('/_dash-update-component', json=body)
+    metrics = render_metrics()
+    assert 'made-up-output' not in metrics
+    assert 'health_callback_seconds_count{output="unknown"' in metrics
+
+def test_response_sizes_are_measured_as_sent(client, frame_source):
+    response = client.post(
+        '/_dash-update-component', json=table_request(full_state(frame_source)),
+        headers={'Accept-Encoding': 'gzip'}
+    )
+    assert response.status_code == 200
+    assert response.content_encoding == 'gzip'
+    gzip.decompress(response.data)
+    metrics = render_metrics()
+    assert f'health_callback_response_bytes_sum{{encoding="gzip",output="data-table"}} {len(response.data)}.0' in metrics
+
+@pytest.fixture
+def profiled_server(monkeypatch, tmp_path):
+    monkeypatch.setenv('HEALTH_PROFILE_THRESHOLD_MS', '0')
+    monkeypatch.setenv('HEALTH_PROFILE_DIR', str(tmp_path))
+    server = Flask(__name__)
+    register_metrics(server, {})
+    return server
+
+def test_concurrent_callback_requests_are_profiled_one_at_a_time(profiled_server, tmp_path):
+    both_inside = threading.Barrier(2, timeout=5)
+
+    @profiled_server.route(CALLBACK_PATH, methods=['POST'])
+    def callback():
+        both_inside.wait()
+        return {}
+
+    statuses = []
+
+    def post():
+        statuses.append(profiled_server.test_client().post(CALLBACK_PATH).status_code)
+
+    requests = [threading.Thread(target=post) for _ in range(2)]
+    for thread in requests:
+        thread.start()
+    for thread in requests:
+        thread.join()
+    assert statuses == [200, 200]
+    assert len(os.listdir(tmp_path)) == 1
+    assert not metrics._profiler_lock.locked()
+
+def test_requests_are_served_when_the_profiler_cannot_start(profiled_server, monkeypatch, tmp_path):
+    class ActiveProfiler(cProfile.Profile):
+        def enable(self):
+            raise ValueError('Another profiling tool is already active')
+
+    monkeypatch.setattr(metrics.cProfile, 'Profile', ActiveProfiler)
+    profiled_server.add_url_rule(CALLBACK_PATH, 'callback', lambda: {}, methods=['POST'])
+    assert profiled_server.test_client().post(CALLBACK_PATH).status_code == 200
+    assert os.listdir(tmp_path) == []
+    assert not metrics._profiler_lock.locked()
+
+def test_result_cache_counters_are_exported(client, frame_source):
+    frame_source.cache.get_or_compute('metrics-test', lambda: 1)
+    frame_source.cache.get_or_compute('metrics-test', lambda: 1)
+    stats = frame_source.cache.stats()
+    metrics = client.get('/metrics').get_data(as_text=True)
+    for name, key in [('health_cache_hits_total', 'hits'), ('health_cache_misses_total', 'misses'),
+                      ('health_cache_evictions_total', 'evictions'), ('health_cache_entries', 'entries')]:
+        assert f'{name} {stats[key]}\n' in metrics
+
+def test_result_cache_metrics_are_labelled_by_tenant(client, tmp_path, monkeypatch):
+    write_csv(50, str(tmp_path / 'north.csv'))
+    registry = TenantRegistry(str(tmp_path))
+    monkeypatch.setattr(tenants, 'registry', registry)
+    cache = registry.get('north').source.cache
+    cache.get_or_compute('metrics-test', lambda: 1)
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'health_cache_misses_total{tenant="north"} 1\n' in metrics
+    assert 'health_cache_entries{tenant="north"} 1\n' in metrics
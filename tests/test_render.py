@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from conftest import append_admissions, full_state
+
+from health import render, sources, tenants
+from health.render import FigureRenderer
+
+def admissions(rendered):
+    return sum(json.loads(rendered.figure_json)['data'][0]['values'])
+
+def test_process_pool_renders_reloaded_data(monkeypatch, frame_source, admissions_csv):
+    # forked workers inherit the patched source
+    monkeypatch.setattr(sources, 'source', frame_source)
+    monkeypatch.setattr(tenants, 'source', frame_source)
+    monkeypatch.setattr(render, 'PAYLOAD_ENCODING', 'json')
+    renderer = FigureRenderer('process', workers=1)
+    try:
+        state = full_state(frame_source)
+        assert admissions(renderer.render('admission-pie-chart', state, 'before')) == 300
+
+        append_admissions(admissions_csv, 200)
+        assert frame_source.reload()
+        state = full_state(frame_source)
+        assert admissions(renderer.render('admission-pie-chart', state, 'after')) == 500
+    finally:
+        renderer._get_executor().shutdown()
+
+def test_thread_pool_renders_current_data(monkeypatch, frame_source):
+    monkeypatch.setattr(tenants, 'source', frame_source)
+    monkeypatch.setattr(render, 'PAYLOAD_ENCODING', 'json')
+    renderer = FigureRenderer('thread', workers=2)
+    try:
+        state = full_state(frame_source)
+        siblings = ['diagnosis-pie-chart']
+        assert admissions(renderer.render('admission-pie-chart', state, 'key', siblings)) == 300
+        assert admissions(renderer.render('diagnosis-pie-chart', state, 'key')) == 300
+    finally:
+        renderer._get_executor().shutdown()
+
+def test_failed_builds_are_not_remembered(monkeypatch, frame_source):
+    monkeypatch.setattr(tenants, 'source', frame_source)
+    monkeypatch.setattr(render, 'PAYLOAD_ENCODING', 'json')
+    build = render.build_figure_json
+    calls = []
+
+    def flaky_build(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('build failed')
+        return build(*args)
+
+    monkeypatch.setattr(render, 'build_figure_json', flaky_build)
+    renderer = FigureRenderer('thread', workers=1)
+    try:
+        state = full_state(frame_source)
+        with pytest.raises(RuntimeError):
+            renderer.render('admission-pie-chart', state, 'key')
+        assert admissions(renderer.render('admission-pie-chart', state, 'key')) == 300
+        assert len(calls) == 2
+    finally:
+        renderer._get_executor().shutdown()
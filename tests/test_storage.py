@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from health.data import is_mapped, load_data, read_csv
+from health.storage import columns_path, is_current, read_columns, write_columns
+
+def assert_same_values(stored, parsed):
+    assert list(stored.columns) == list(parsed.columns)
+    for name in parsed.columns:
+        if pd.api.types.is_datetime64_any_dtype(parsed[name]):
+            pd.testing.assert_series_equal(stored[name], parsed[name], check_dtype=False)
+        elif pd.api.types.is_numeric_dtype(parsed[name]):
+            np.testing.assert_allclose(stored[name].astype('float64'), parsed[name].astype('float64'), rtol=1e-6)
+        else:
+            pd.testing.assert_series_equal(
+                stored[name].astype(object), parsed[name].astype(object).where(parsed[name].notna(), np.nan)
+            )
+
+def test_columns_round_trip_the_csv_load(admissions_csv):
+    frame = pd.read_csv(admissions_csv)
+    frame.loc[[4, 90], 'Medication'] = np.nan
+    frame.loc[[12], 'Age'] = np.nan
+    frame.to_csv(admissions_csv, index=False)
+    parsed, parsed_monthly = load_data(admissions_csv)
+
+    write_columns(read_csv(admissions_csv), columns_path(admissions_csv), source_path=admissions_csv)
+    assert is_current(columns_path(admissions_csv), admissions_csv)
+    stored, stored_monthly = load_data(admissions_csv)
+
+    assert_same_values(stored, parsed)
+    pd.testing.assert_frame_equal(stored_monthly, parsed_monthly, check_dtype=False, check_categorical=False)
+    assert is_mapped(stored['Billing Amount'].to_numpy())
+    assert is_mapped(stored['Medication'].array.codes)
+    assert_same_values(read_columns(columns_path(admissions_csv), mmap=False), parsed)
+
+def test_columns_of_a_changed_csv_are_not_read(admissions_csv):
+    write_columns(read_csv(admissions_csv), columns_path(admissions_csv), source_path=admissions_csv)
+    stat = os.stat(admissions_csv)
+    os.utime(admissions_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not is_current(columns_path(admissions_csv), admissions_csv)
+    assert not is_mapped(load_data(admissions_csv)[0]['Billing Amount'].to_numpy())
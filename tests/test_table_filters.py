@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from conftest import full_state
+
+from health.sources import SqliteSource, apply_table_query, split_filter_part, write_sqlite
+
+def test_split_filter_part_keeps_the_value_as_written():
+    assert split_filter_part('{Name} contains 12') == ('Name', 'contains', '12')
+    assert split_filter_part('{Age} ge 30') == ('Age', 'ge', '30')
+    assert split_filter_part('{Name} eq "Patient 7"') == ('Name', 'eq', 'Patient 7')
+
+@pytest.fixture(params=['frame', 'sqlite'])
+def table_source(request, frame_source, tmp_path):
+    if request.param == 'frame':
+        return frame_source
+    path = str(tmp_path / 'admissions.sqlite')
+    write_sqlite(frame_source.load().data, path)
+    return SqliteSource(path)
+
+def table_rows(data_source, filter_query):
+    records, page_count = data_source.table_page(full_state(data_source), 0, 1000, [], filter_query)
+    return pd.DataFrame(records)
+
+def test_contains_a_number_matches_its_digits(table_source):
+    rows = table_rows(table_source, '{Name} contains 12')
+    assert len(rows) > 0
+    assert rows['Name'].str.contains('12').all()
+
+    rooms = table_rows(table_source, '{Room Number} contains 1')
+    assert len(rooms) > 0
+    assert rooms['Room Number'].astype(str).str.contains('1').all()
+
+def test_numeric_comparisons(table_source):
+    rows = table_rows(table_source, '{Age} ge 30 && {Age} lt 40')
+    assert len(rows) > 0
+    assert rows['Age'].between(30, 39).all()
+
+@pytest.mark.parametrize('filter_query', ['{Age} gt abc', '{Billing Amount} le x1', '{Date of Admission} ge soon'])
+def test_values_that_do_not_convert_are_skipped(table_source, filter_query):
+    assert len(table_rows(table_source, filter_query)) == 300
+
+def test_text_compared_with_a_number(table_source):
+    rows = table_rows(table_source, '{Name} gt 5')
+    assert (rows['Name'] > '5').all()
+
+def test_apply_table_query_on_a_frame():
+    frame = pd.DataFrame({'Name': pd.Categorical(['Patient 12', 'Patient 3']), 'Age': [20, 40]})
+    assert list(apply_table_query(frame, [], '{Name} contains 12')['Name']) == ['Patient 12']
+    assert list(apply_table_query(frame, [], '{Age} gt abc')['Age']) == [20, 40]
+    assert list(apply_table_query(frame, [], '{Age} gt 30.5')['Age']) == [40]
@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import write_csv
+
+from health import tenants
+from health.tenants import TenantRegistry, create_registry
+
+@pytest.fixture
+def tenants_dir(tmp_path):
+    for seed, name in enumerate(['north', 'south', 'west']):
+        write_csv(100, str(tmp_path / f'{name}.csv'), seed=seed)
+    return str(tmp_path)
+
+def use(registry, name):
+    # the first request starts the load, the next one after it finished measures the dataset
+    registry.get(name).source.load()
+    return registry.get(name)
+
+def loaded(registry):
+    return sorted(name for name, usage in registry.memory_report().items() if usage['loaded'])
+
+def test_least_recently_used_tenants_are_unloaded(tenants_dir):
+    registry = TenantRegistry(tenants_dir, max_loaded=2)
+    use(registry, 'north')
+    use(registry, 'south')
+    assert loaded(registry) == ['north', 'south']
+
+    use(registry, 'west')
+    assert loaded(registry) == ['south', 'west']
+    assert registry.unloads == 1
+
+    registry.get('south')
+    use(registry, 'north')
+    assert loaded(registry) == ['north', 'south']
+    assert registry.unloads == 2
+
+def test_memory_budget_keeps_the_tenant_in_use(tenants_dir):
+    registry = TenantRegistry(tenants_dir, max_loaded=0, memory_budget=1)
+    use(registry, 'north')
+    use(registry, 'south')
+    assert loaded(registry) == ['south']
+    assert registry.memory_report()['south']['private_bytes'] > 0
+
+def test_max_tenants_comes_from_the_environment(tenants_dir, monkeypatch):
+    monkeypatch.setenv('HEALTH_TENANTS_DIR', tenants_dir)
+    monkeypatch.setenv('HEALTH_MAX_TENANTS', '1')
+    registry = create_registry()
+    monkeypatch.setattr(tenants, 'registry', registry)
+    assert registry.names() == ['north', 'south', 'west']
+
+    use(registry, 'north')
+    use(registry, 'west')
+    assert loaded(registry) == ['west']
+    assert tenants.tenant_source('north') is registry.get('north').source
+    assert registry.get('unknown') is None